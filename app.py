@@ -1,19 +1,19 @@
 import streamlit as st
-import pandas as pd
-from utils.database import create_tables, fill_tables, create_views
+from utils.database import cache_stats
+from utils.profiling import profile_page, render_debug_panel
+from utils.startup import prepare_database, startup_times
 
 def main():
     st.set_page_config(page_title="ANAC", layout="wide")
-    df = pd.read_csv('./data/anac.csv', encoding='latin-1', delimiter=";")
-    create_tables()
-    fill_tables(df)
-    create_views()
+    prepare_database('./data/anac.csv')
 
     tables = st.Page("./frontend/tables.py", title="Tabela ANAC", icon="✈️", default=True)
     graphs = st.Page("./frontend/graphs.py", title="Gráficos ANAC", icon="📈")
 
     pg = st.navigation([tables, graphs])
-    pg.run()
+    with profile_page(pg.title) as trace:
+        pg.run()
+    render_debug_panel(trace, cache_stats(), startup_times())
 
 
 if __name__ == "__main__":
@@ -1,20 +1,27 @@
 import streamlit as st
-from utils.flies_map import render_map
-from utils.graph_utils import mostrar_big_numbers, mostrar_graficos, aplicar_filtro_mensal, mostrar_comparativo_mensal_percentual
-from utils.database import get_all
+from utils.flies_map import map_task, network_task
+from utils.graph_utils import (aplicar_filtros_periodo, tarefa_big_numbers, tarefa_comparativo_mensal,
+                               tarefa_explorar_cubo, tarefas_graficos)
+from utils.prefetch import render_concurrently
 
 big_numbers, graphs, flies_map = st.tabs(["Big Numbers", "Gráficos", "Mapa de Voos"])
 
 
-df = get_all("RelatorioVoosDetalhado")
-df, ft = aplicar_filtro_mensal(df)
+filters, ft, filtros_anteriores = aplicar_filtros_periodo()
+tarefas = []
 with big_numbers:
-    mostrar_big_numbers(df)
+    tarefas.append(tarefa_big_numbers(filters, filtros_anteriores))
 with graphs:
     st.title("📈 Gráficos ANAC 📊")
     if not ft != 0:
-        mostrar_comparativo_mensal_percentual(df)
-    mostrar_graficos(df)
+        tarefas.append(tarefa_comparativo_mensal(filters))
+    tarefas.extend(tarefas_graficos(filters))
+    tarefas.append(tarefa_explorar_cubo(filters))
 with flies_map:
     st.title("🛬 Mapa das rotas de Voo 🗺")
-    render_map(ft)
\ No newline at end of file
+    tarefas.append(map_task(filters))
+    st.title("🕸️ Rede de Rotas")
+    tarefas.append(network_task(filters))
+
+# As três abas buscam seus dados ao mesmo tempo e cada parte aparece assim que chega.
+render_concurrently(tarefas)
@@ -0,0 +1,178 @@
+import pandas as pd
+import pytest
+
+from utils import cache, database
+from utils.cache import QueryCache, clear_memos, estimate_size, freeze, versioned_memo
+from utils.connection import close_pools, get_pool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "teste.db")
+    with get_pool(path).writer() as conn, conn:
+        conn.execute("CREATE TABLE cargas (id INTEGER PRIMARY KEY, arquivo TEXT)")
+        conn.execute("CREATE TABLE voos (id INTEGER PRIMARY KEY, empresa TEXT)")
+        conn.execute("INSERT INTO cargas (arquivo) VALUES ('a.csv')")
+        conn.execute("INSERT INTO voos (empresa) VALUES ('GOL')")
+    database.clear_cache(path)
+    yield path
+    database.clear_cache(path)
+    close_pools()
+
+
+def insert(path, sql):
+    with get_pool(path).writer() as conn, conn:
+        conn.execute(sql)
+
+
+def test_query_cache_hit_and_miss():
+    queries = QueryCache()
+    assert queries.get("q", 1) is None
+    queries.put("q", [1, 2], 1)
+    assert queries.get("q", 1) == [1, 2]
+    stats = queries.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_query_cache_is_dropped_when_the_version_changes():
+    queries = QueryCache()
+    queries.put("a", [1], 1)
+    queries.put("b", [2], 1)
+    assert queries.get("a", 2) is None
+    assert queries.get("b", 2) is None
+    assert queries.stats()["invalidations"] == 1
+    assert queries.stats()["entries"] == 0
+
+    queries.put("a", [3], 2)
+    queries.put("b", [4], 3)
+    assert queries.get("a", 3) is None
+    assert queries.get("b", 3) == [4]
+
+
+def test_query_cache_entries_expire(clock):
+    queries = QueryCache(ttl=10)
+    queries.put("q", [1], 1)
+    clock.now += 9
+    assert queries.get("q", 1) == [1]
+    clock.now += 2
+    assert queries.get("q", 1) is None
+    assert queries.stats()["expirations"] == 1
+
+
+def test_query_cache_evicts_the_least_recently_used():
+    frame = pd.DataFrame({"x": range(100)})
+    size = estimate_size(frame)
+    queries = QueryCache(max_bytes=2 * size)
+    queries.put("a", frame, 1)
+    queries.put("b", frame, 1)
+    queries.get("a", 1)
+    queries.put("c", frame, 1)
+    assert queries.get("b", 1) is None
+    assert queries.get("a", 1) is frame
+    assert queries.get("c", 1) is frame
+    assert queries.stats()["evictions"] == 1
+    assert queries.stats()["bytes"] == 2 * size
+
+
+def test_query_cache_skips_results_larger_than_the_limit():
+    queries = QueryCache(max_bytes=10)
+    queries.put("q", pd.DataFrame({"x": range(100)}), 1)
+    assert queries.stats()["entries"] == 0
+
+
+def test_freeze_makes_filters_hashable():
+    assert freeze({"b": [1, 2], "a": {"c": 3}}) == (("a", (("c", 3),)), ("b", (1, 2)))
+    assert hash(freeze([{"ano": 2024}, ("mes", [1, 2])]))
+
+
+def test_versioned_memo_is_dropped_when_the_version_changes():
+    version = [1]
+    calls = []
+
+    @versioned_memo(4, lambda: version[0])
+    def double(x):
+        calls.append(x)
+        return 2 * x
+
+    assert double(2) == 4
+    assert double(2) == 4
+    assert calls == [2]
+    version[0] = 2
+    assert double(2) == 4
+    assert calls == [2, 2]
+
+
+def test_versioned_memo_keys_on_bound_arguments_and_evicts():
+    calls = []
+
+    @versioned_memo(2, lambda: 1)
+    def total(filters=None, by="decolagens"):
+        calls.append((freeze(filters), by))
+        return len(calls)
+
+    assert total({"ano": 2024}) == total({"ano": 2024}, by="decolagens") == total(filters={"ano": 2024}) == 1
+    assert total([1, 2]) == 2
+    assert total(None) == 3
+    assert total({"ano": 2024}) == 4
+    assert len(calls) == 4
+
+
+def test_clear_memos_empties_every_memo():
+    calls = []
+
+    @versioned_memo(4, lambda: 1)
+    def identity(x):
+        calls.append(x)
+        return x
+
+    identity(1)
+    clear_memos()
+    identity(1)
+    assert calls == [1, 1]
+
+
+def test_cached_reads_follow_the_dataset_version(db_path):
+    query = "SELECT empresa FROM voos ORDER BY id"
+    assert database.execute_query(query, fetch=True, db_path=db_path) == [("GOL",)]
+
+    insert(db_path, "INSERT INTO voos (empresa) VALUES ('AZUL')")
+    assert database.execute_query(query, fetch=True, db_path=db_path) == [("GOL",)]
+
+    insert(db_path, "INSERT INTO cargas (arquivo) VALUES ('b.csv')")
+    get_pool(db_path).dataset_version = None
+    assert database.execute_query(query, fetch=True, db_path=db_path) == [("GOL",), ("AZUL",)]
+
+
+def test_dataset_version_is_kept_on_the_pool(db_path, monkeypatch):
+    assert database.get_dataset_version(db_path) == 1
+    insert(db_path, "INSERT INTO cargas (arquivo) VALUES ('b.csv')")
+    assert database.get_dataset_version(db_path) == 1
+    monkeypatch.setattr(database, "VERSION_TTL", 0)
+    assert database.get_dataset_version(db_path) == 2
+
+
+def test_cached_results_are_copied(db_path):
+    query = "SELECT id, empresa FROM voos"
+    rows = database.execute_query(query, return_columns=True, db_path=db_path)
+    rows[0]["empresa"] = "ALTERADA"
+    rows.append({"id": 0})
+    frame = database.execute_query(query, df=True, db_path=db_path)
+    frame.loc[0, "empresa"] = "ALTERADA"
+
+    assert database.execute_query(query, return_columns=True, db_path=db_path) == [{"id": 1, "empresa": "GOL"}]
+    assert database.execute_query(query, df=True, db_path=db_path)["empresa"].tolist() == ["GOL"]
@@ -0,0 +1,170 @@
+import itertools
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.cube import CUBE_DIMENSIONS, CUBES, GEO_DIMENSIONS, Cube, cube_for
+from utils.database import CUBE_KEYS, CUBE_MEASURES, ROLLUP_MEASURES, refresh_cube
+from utils.filters import Eq, In, Range, compile_filters
+
+DIMENSOES = ["periodo", "natureza", "nome_empresa", "continente_destino"]
+
+
+@pytest.fixture
+def cells():
+    """Células sintéticas com dimensões nulas e medidas com nulos, como as da view CuboVoos."""
+    rng = np.random.default_rng(0)
+    n = 400
+    data = pd.DataFrame({
+        "periodo": rng.choice([202301, 202302, 202401], n),
+        "natureza": rng.choice(["DOMÉSTICA", "INTERNACIONAL", None], n),
+        "nome_empresa": rng.choice(["GOL", "AZUL", "D'ANGELO", "TAP"], n),
+        "continente_destino": rng.choice(["AMÉRICA DO SUL", "EUROPA", None], n),
+    })
+    for measure in CUBE_MEASURES:
+        data[measure] = rng.integers(0, 1000, n)
+    data.loc[rng.random(n) < 0.1, "assentos"] = np.nan
+    return data
+
+
+@pytest.fixture
+def conn(cells):
+    conn = sqlite3.connect(":memory:")
+    cells.to_sql("cubo", conn, index=False)
+    yield conn
+    conn.close()
+
+
+def as_cube(cells):
+    data = cells.copy()
+    for name in DIMENSOES:
+        if data[name].dtype == object:
+            data[name] = data[name].astype("category")
+    return Cube(data)
+
+
+def group_by(conn, by, filters=()):
+    where, params = compile_filters(list(filters))
+    sums = ", ".join(f"COALESCE(SUM({measure}), 0) AS {measure}" for measure in CUBE_MEASURES)
+    sql = f"SELECT {', '.join(by)}, {sums} FROM cubo {'WHERE ' + where if where else ''} GROUP BY {', '.join(by)}"
+    return pd.read_sql(sql, conn, params=params)
+
+
+def rows(frame, by):
+    frame = frame.astype({name: object for name in by}).astype({m: "float64" for m in CUBE_MEASURES})
+    frame = frame.where(frame.notna(), None)
+    return sorted(frame[[*by, *CUBE_MEASURES]].itertuples(index=False, name=None), key=repr)
+
+
+@pytest.mark.parametrize("by", [list(c) for k in (1, 2, 3) for c in itertools.combinations(DIMENSOES, k)])
+def test_rollup_matches_sql_group_by(cells, conn, by):
+    assert rows(as_cube(cells).rollup(by), by) == rows(group_by(conn, by), by)
+
+
+@pytest.mark.parametrize("filters", [
+    [Eq("periodo", 202302)],
+    [Range("periodo", 202302, None), In("nome_empresa", ("D'ANGELO", "TAP"))],
+    [Eq("natureza", None) | Eq("continente_destino", "EUROPA")],
+    [In("nome_empresa", ())],
+])
+def test_slice_matches_sql_where(cells, conn, filters):
+    by = ["nome_empresa", "natureza"]
+    assert rows(as_cube(cells).slice(filters).rollup(by), by) == rows(group_by(conn, by, filters), by)
+
+
+def test_rollup_without_dimensions_sums_everything(cells):
+    total = as_cube(cells).rollup()
+    assert total.loc[0, "registros"] == cells["registros"].sum()
+    assert total.loc[0, "assentos"] == cells["assentos"].sum()
+
+
+def test_rollup_keeps_integer_measures(cells):
+    resultado = as_cube(cells).rollup("nome_empresa", ["registros", "assentos"])
+    assert resultado["registros"].dtype == cells["registros"].dtype
+    assert resultado["assentos"].dtype == np.float64
+
+
+def test_slice_rejects_columns_outside_the_cube(cells):
+    with pytest.raises(ValueError):
+        as_cube(cells).slice([Eq("uf_origem", "SP")])
+
+
+def test_cube_for_picks_the_first_cube_with_every_dimension():
+    assert cube_for(["nome_empresa", "continente_destino", "periodo"]) == "CuboVoos"
+    assert cube_for(["uf_origem", "pais_destino"]) == "CuboGeografico"
+    assert cube_for(["continente_origem"]) == "CuboVoos"
+    assert cube_for(["nome_empresa", "uf_origem"]) is None
+    assert CUBES == {"CuboVoos": CUBE_DIMENSIONS, "CuboGeografico": GEO_DIMENSIONS}
+
+
+# Voos de 2024-01 e 2024-02 entre três aeroportos.
+AEROPORTOS = [(1, "AMÉRICA DO SUL"), (2, "AMÉRICA DO SUL"), (3, "EUROPA")]
+VOOS = [
+    (2024, 1, "DOMÉSTICA", "REGULAR", 1, 1, 2, 100, 10, 1, 180, 50, 900),
+    (2024, 1, "DOMÉSTICA", "REGULAR", 1, 2, 1, 90, None, 1, 180, None, 800),
+    (2024, 1, "INTERNACIONAL", "REGULAR", 2, 1, 3, 200, 5, 1, 300, 70, 5000),
+    (2024, 2, "INTERNACIONAL", "NÃO REGULAR", 2, 1, 3, 150, 0, 1, None, 10, 4800),
+    (2024, 2, "DOMÉSTICA", "REGULAR", 1, 1, 2, 120, 3, 2, 180, 40, 1700),
+]
+
+
+@pytest.fixture
+def loaded():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE aeroportos (id INTEGER PRIMARY KEY, continente TEXT)")
+    conn.execute("""CREATE TABLE voos (ano INTEGER, mes INTEGER, periodo INTEGER, natureza TEXT, grupo_voo TEXT,
+                    empresa_id INTEGER, aeroporto_origem_id INTEGER, aeroporto_destino_id INTEGER,
+                    passageiros_pagos INTEGER, passageiros_gratis INTEGER, decolagens INTEGER, assentos INTEGER,
+                    carga_paga_kg INTEGER, combustivel_litros INTEGER)""")
+    columns = {"ano": "INTEGER", "mes": "INTEGER", "periodo": "INTEGER"}
+    columns.update({key: kind for key, (kind, _) in CUBE_KEYS.items()})
+    columns.update({measure: ROLLUP_MEASURES[measure][0] for measure in CUBE_MEASURES})
+    conn.execute(f"CREATE TABLE resumo_cubo ({', '.join(f'{c} {k}' for c, k in columns.items())})")
+    conn.execute("CREATE TABLE cubo_aeroportos (id INTEGER PRIMARY KEY, continente TEXT)")
+    conn.execute("CREATE TABLE resumo_mensal (ano INTEGER, mes INTEGER)")
+    conn.executemany("INSERT INTO aeroportos VALUES (?, ?)", AEROPORTOS)
+    conn.executemany(f"INSERT INTO voos VALUES ({', '.join('?' * 14)})",
+                     [(ano, mes, ano * 100 + mes, *resto) for ano, mes, *resto in VOOS])
+    conn.executemany("INSERT INTO resumo_mensal VALUES (?, ?)", [(2024, 1), (2024, 2)])
+    refresh_cube(conn, [(2024, 1), (2024, 2)])
+    yield conn
+    conn.close()
+
+
+def expected_cells(conn):
+    measures = ", ".join(ROLLUP_MEASURES[measure][1] for measure in CUBE_MEASURES)
+    return conn.execute(f"""
+        SELECT v.periodo, v.natureza, v.grupo_voo, v.empresa_id, ao.continente, ad.continente, {measures}
+        FROM voos AS v
+        JOIN aeroportos AS ao ON ao.id = v.aeroporto_origem_id
+        JOIN aeroportos AS ad ON ad.id = v.aeroporto_destino_id
+        GROUP BY 1, 2, 3, 4, 5, 6 ORDER BY 1, 2, 3, 4, 5, 6""").fetchall()
+
+
+def stored_cells(conn):
+    return conn.execute(f"""
+        SELECT periodo, {', '.join(CUBE_KEYS)}, {', '.join(CUBE_MEASURES)}
+        FROM resumo_cubo ORDER BY 1, 2, 3, 4, 5, 6""").fetchall()
+
+
+def test_refresh_cube_matches_the_flights(loaded):
+    assert stored_cells(loaded) == expected_cells(loaded)
+    assert len(stored_cells(loaded)) == 4
+
+
+def test_refresh_cube_replaces_only_the_given_periods(loaded):
+    loaded.execute("DELETE FROM voos WHERE periodo = 202402")
+    refresh_cube(loaded, [(2024, 1)])
+    assert {row[0] for row in stored_cells(loaded)} == {202401, 202402}
+    refresh_cube(loaded, [(2024, 2)])
+    assert stored_cells(loaded) == expected_cells(loaded)
+
+
+def test_refresh_cube_recalculates_every_period_when_a_continent_changes(loaded):
+    loaded.execute("UPDATE aeroportos SET continente = 'ÁFRICA' WHERE id = 3")
+    assert stored_cells(loaded) != expected_cells(loaded)
+    refresh_cube(loaded, [])
+    assert stored_cells(loaded) == expected_cells(loaded)
+    assert loaded.execute("SELECT continente FROM cubo_aeroportos WHERE id = 3").fetchone() == ("ÁFRICA",)
@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+from utils.filters import And, Eq, In, Or, Range, as_filter, compile_filters, filter_columns, from_dict
+
+EMPRESAS = [
+    (1, "D'ANGELO TÁXI AÉREO", "BRASILEIRA", 2023),
+    (2, "GOL", "BRASILEIRA", 2024),
+    (3, "AIR FRANCE", "ESTRANGEIRA", 2024),
+    (4, "TAP", "ESTRANGEIRA", 2023),
+    (5, "SEM NACIONALIDADE", None, 2024),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE empresas (id INTEGER PRIMARY KEY, nome TEXT, nacionalidade TEXT, ano INTEGER)")
+    conn.executemany("INSERT INTO empresas VALUES (?, ?, ?, ?)", EMPRESAS)
+    yield conn
+    conn.close()
+
+
+def select_ids(conn, filters):
+    sql, params = compile_filters(filters)
+    where = f"WHERE {sql}" if sql else ""
+    return [row[0] for row in conn.execute(f"SELECT id FROM empresas {where} ORDER BY id", params)]
+
+
+def test_in_with_apostrophes_is_a_parameter(conn):
+    sql, params = In("nome", ("D'ANGELO TÁXI AÉREO", "GOL")).compile()
+    assert "'" not in sql
+    assert select_ids(conn, In("nome", ("D'ANGELO TÁXI AÉREO", "GOL"))) == [1, 2]
+    assert select_ids(conn, In("nome", ("x' OR '1'='1",))) == []
+
+
+def test_in_keeps_the_same_sql_for_any_number_of_values():
+    assert In("id", (1,)).compile()[0] == In("id", (1, 2, 3)).compile()[0] == In("id", ()).compile()[0]
+
+
+def test_empty_in_selects_nothing(conn):
+    assert select_ids(conn, In("nome", ())) == []
+    assert select_ids(conn, from_dict({"nome": []})) == []
+    assert select_ids(conn, Or((In("nome", ()), Eq("id", 2)))) == [2]
+
+
+def test_or_inside_and_is_parenthesised(conn):
+    expression = (Eq("nacionalidade", "BRASILEIRA") | Eq("nacionalidade", "ESTRANGEIRA")) & Eq("ano", 2024)
+    sql, params = expression.compile()
+    assert sql == "((nacionalidade = ?) OR (nacionalidade = ?)) AND (ano = ?)"
+    assert params == ("BRASILEIRA", "ESTRANGEIRA", 2024)
+    assert select_ids(conn, expression) == [2, 3]
+
+
+def test_and_inside_or_is_parenthesised(conn):
+    expression = Or((And((Eq("ano", 2023), Eq("nacionalidade", "ESTRANGEIRA"))), Eq("id", 2)))
+    assert expression.compile()[0] == "((ano = ?) AND (nacionalidade = ?)) OR (id = ?)"
+    assert select_ids(conn, expression) == [2, 4]
+
+
+def test_range_with_an_open_side_or_none(conn):
+    assert select_ids(conn, Range("id", 2, 3)) == [2, 3]
+    assert select_ids(conn, Range("id", high=2)) == [1, 2]
+    assert select_ids(conn, Range("id")) == [1, 2, 3, 4, 5]
+
+
+def test_eq_none_is_null(conn):
+    assert Eq("nacionalidade", None).compile() == ("nacionalidade IS NULL", ())
+    assert select_ids(conn, Eq("nacionalidade", None)) == [5]
+
+
+def test_empty_combinations_select_everything(conn):
+    assert And(()).compile() == ("1", ())
+    assert select_ids(conn, And(())) == [1, 2, 3, 4, 5]
+
+
+def test_as_filter_accepts_dicts_and_lists():
+    assert as_filter({}) is None
+    assert as_filter([]) is None
+    assert as_filter({"ano": 2024, "id": [1, 2]}) == And((Eq("ano", 2024), In("id", (1, 2))))
+    assert as_filter([Eq("ano", 2024)]) == And((Eq("ano", 2024),))
+    assert filter_columns([Eq("ano", 2024), Range("mes", 1, 3)]) == {"ano", "mes"}
+
+
+@pytest.mark.parametrize("filters", ["ano = 2024", ["ano = 2024"], [Eq("ano", 2024), "mes = 1"]])
+def test_sql_strings_are_rejected(filters):
+    with pytest.raises(TypeError):
+        as_filter(filters)
+
+
+def test_invalid_column_names_are_rejected():
+    with pytest.raises(ValueError):
+        Eq("ano; DROP TABLE voos", 1).compile()
+    with pytest.raises(ValueError):
+        from_dict({"mes": 1}, suffix=" OR 1").compile()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from utils.network import RouteNetwork
+
+# 10 -> 20 -> 30 -> 40 -> 10, com o atalho 10 -> 30 e a rota isolada 50 -> 60.
+ROTAS = [(10, 20, 5), (20, 30, 3), (30, 40, 2), (40, 10, 1), (10, 30, 7), (50, 60, 4)]
+
+
+@pytest.fixture
+def network():
+    origins, destinations, decolagens = zip(*reversed(ROTAS))
+    return RouteNetwork.from_edges(origins, destinations, {"decolagens": decolagens})
+
+
+def test_from_edges_builds_sorted_csr(network):
+    assert network.airports.tolist() == [10, 20, 30, 40, 50, 60]
+    assert network.indptr.tolist() == [0, 2, 3, 4, 5, 6, 6]
+    assert network.airports[network.indices].tolist() == [20, 30, 30, 40, 10, 60]
+    assert network.weights["decolagens"].tolist() == [5, 7, 3, 2, 1, 4]
+    assert (network.size, network.routes) == (6, 6)
+
+
+def test_neighbors(network):
+    assert network.neighbors(10).to_dict() == {20: 5, 30: 7}
+    assert network.neighbors(60).empty
+    assert network.neighbors(99).empty
+
+
+@pytest.mark.parametrize("hops, expected", [
+    (0, {}),
+    (1, {20: 1, 30: 1}),
+    (2, {20: 1, 30: 1, 40: 2}),
+    (10, {20: 1, 30: 1, 40: 2}),
+])
+def test_reachable_hop_limits(network, hops, expected):
+    assert network.reachable(10, hops).to_dict() == expected
+
+
+def test_reachable_keeps_the_fewest_hops_and_skips_the_origin(network):
+    alcance = network.reachable(20, 3)
+    assert alcance.to_dict() == {30: 1, 40: 2, 10: 3}
+    assert 20 not in alcance.index
+
+
+def test_reachable_from_outside_or_from_a_sink(network):
+    assert network.reachable(99, 3).empty
+    assert network.reachable(60, 3).empty
+    assert network.reachable(50, 3).to_dict() == {60: 1}
+
+
+def test_degree_stats(network):
+    stats = network.degree_stats()
+    assert stats.loc[10].to_dict() == {"destinos": 2, "origens": 1, "saida": 12, "entrada": 1, "total": 13}
+    assert stats.loc[30].to_dict() == {"destinos": 1, "origens": 2, "saida": 2, "entrada": 10, "total": 12}
+    assert stats["saida"].sum() == stats["entrada"].sum() == sum(peso for *_, peso in ROTAS)
+
+
+def test_hubs_order_by_traffic(network):
+    assert network.hubs(top_n=2).index.tolist() == [10, 30]
+
+
+def test_empty_network():
+    network = RouteNetwork.from_edges([], [], {"decolagens": []})
+    assert network.size == network.routes == 0
+    assert network.reachable(10).empty
+    assert np.array_equal(network.indptr, [0])
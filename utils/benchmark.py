@@ -0,0 +1,285 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# O benchmark mede também as leituras pelo snapshot Parquet (ver ingest), que no app são opcionais.
+os.environ.setdefault("ANAC_SNAPSHOT", "1")
+
+from utils.database import CSV_PATH
+
+TOLERANCE = 0.2
+FILTERS = {"todos": {}, "mes": {"mes": 1}}
+# Gráficos servidos pelo cubo em memória (ver utils.cube), medidos também com ele já lido.
+FIGURAS_CUBO = ["figura_destino_por_continente", "figura_voos_por_empresa", "figura_grupo_voo",
+                "figura_empresa_nacionalidade"]
+
+
+def silence_streamlit():
+    """Fora do `streamlit run` cada chamada de `st.*` gera um aviso; no benchmark eles só atrapalham."""
+    from streamlit import config
+    from streamlit.logger import set_log_level
+
+    # A configuração é lida na primeira chamada de `st.*` e reaplica o nível de log dela.
+    config.set_option("logger.level", "error")
+    set_log_level(logging.ERROR)
+
+
+def measure(func, repeat, reset=None):
+    """
+    Executa `func` `repeat` vezes, chamando `reset` antes de cada execução.
+
+    Returns:
+        dict: `min`, `median` e `mean` em segundos e a quantidade de execuções.
+    """
+    tempos = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return {"min": min(tempos), "median": statistics.median(tempos), "mean": statistics.mean(tempos), "repeat": repeat}
+
+
+def cold_caches():
+    from utils.cache import clear_memos
+    from utils.cube import clear_cube
+    from utils.database import clear_cache
+    from utils.facets import clear_facets
+
+    clear_cache()
+    clear_memos()
+    clear_cube()
+    clear_facets()
+
+
+def cube_loaded():
+    """Caches frios, mas com o cubo já lido, como depois do primeiro desenho de cada versão dos dados."""
+    from utils.cube import get_cube
+
+    cold_caches()
+    get_cube()
+
+
+def ingest(paths):
+    """
+    Carrega os CSVs sintéticos do zero, medindo cada etapa uma única vez.
+
+    Returns:
+        tuple: (resultados por etapa, total de voos carregados).
+    """
+    from utils.columnar import ensure_snapshots
+    from utils.database import DB_PATH, create_tables, create_views, fill_tables, get_dataset_version
+
+    resultados = {}
+    inicio = time.perf_counter()
+    create_tables()
+    resultados["ingest/create_tables"] = {"seconds": time.perf_counter() - inicio}
+
+    voos = 0
+    inicio = time.perf_counter()
+    for path in paths:
+        voos += sum(fill_tables(path).values())
+    duracao = time.perf_counter() - inicio
+    resultados["ingest/fill_tables"] = {"seconds": duracao, "rows": voos, "rows_per_s": voos / max(duracao, 1e-9)}
+
+    inicio = time.perf_counter()
+    create_views()
+    resultados["ingest/create_views"] = {"seconds": time.perf_counter() - inicio}
+
+    inicio = time.perf_counter()
+    ensure_snapshots(DB_PATH, get_dataset_version())
+    resultados["ingest/ensure_snapshots"] = {"seconds": time.perf_counter() - inicio}
+    return resultados, voos
+
+
+def benchmarks():
+    """
+    Casos medidos depois da carga: views, funções de consulta, tabelas, mapa e gráficos.
+
+    Returns:
+        dict: Nome do caso -> função sem argumentos, ou (função, preparo) para casos que não
+        partem de caches vazios (ver `measure`).
+    """
+    import streamlit as st
+
+    from utils import graph_utils
+    from utils.cube import CUBES, load_cube
+    from utils.database import (VIEWS, execute_query, get_aggregate, get_all, get_count, get_mean, get_page,
+                                get_sum, get_unique)
+    from utils.flies_map import MAX_HOPS, aggregate_routes, map_task, network_summary
+    from utils.network import route_network
+    from utils.prefetch import render_concurrently
+    from utils.table_utils import print_table, render_tables
+
+    silence_streamlit()
+    casos = {}
+    for view in VIEWS:
+        casos[f"views/{view}"] = lambda view=view: execute_query(f"SELECT COUNT(*) FROM {view}", fetch=True, cache=False)
+
+    for nome, filters in FILTERS.items():
+        casos[f"queries/get_all[{nome}]"] = lambda f=filters: get_all("RelatorioVoosDetalhado", filters=f)
+        casos[f"queries/get_page[{nome}]"] = lambda f=filters: get_page("RelatorioVoosDetalhado", f, "passageiros_pagos", True)
+        casos[f"queries/get_count[{nome}]"] = lambda f=filters: get_count("RelatorioVoosDetalhado", f)
+        casos[f"queries/get_sum[{nome}]"] = lambda f=filters: get_sum("RelatorioVoosDetalhado", ["passageiros_pagos", "passageiros_gratis"], f)
+        casos[f"queries/get_mean[{nome}]"] = lambda f=filters: get_mean("RelatorioVoosDetalhado", "horas_voadas", f)
+        casos[f"queries/get_aggregate[{nome}]"] = lambda f=filters: get_aggregate(
+            "RelatorioVoosDetalhado", {"voos": "SUM(decolagens)", "carga": "SUM(carga_paga_kg)"}, f, group_by="sigla_empresa")
+        casos[f"queries/get_unique[{nome}]"] = lambda f=filters: get_unique("RelatorioVoosDetalhado", "nome_empresa", f)
+
+    casos["render/render_tables"] = render_tables
+    casos["render/print_table"] = lambda: print_table("RelatorioVoosDetalhado", [], "Voos")
+    casos["render/aggregate_routes"] = lambda: aggregate_routes({}, "decolagens", 500)
+    casos["render/map_task"] = lambda: render_concurrently([map_task([])])
+    casos["network/route_network"] = route_network
+    casos["network/network_summary"] = lambda: network_summary([], {}, 1, MAX_HOPS)
+
+    for nome, filters in FILTERS.items():
+        for figura in graph_utils.GRAFICOS:
+            casos[f"charts/{figura.__name__}[{nome}]"] = lambda g=figura, f=filters: st.plotly_chart(g(f))
+        # Como nas páginas: cada parte é buscada no pool de leitura e desenhada ao chegar.
+        casos[f"charts/tarefa_big_numbers[{nome}]"] = lambda f=filters: render_concurrently(
+            [graph_utils.tarefa_big_numbers(f)])
+        casos[f"charts/tarefas_graficos[{nome}]"] = lambda f=filters: render_concurrently(
+            graph_utils.tarefas_graficos(f))
+        for figura in FIGURAS_CUBO:
+            casos[f"charts/{figura}[{nome}, cubo lido]"] = (
+                lambda g=getattr(graph_utils, figura), f=filters: st.plotly_chart(g(f)), cube_loaded)
+        casos[f"charts/tarefas_graficos[{nome}, cubo lido]"] = (
+            lambda f=filters: render_concurrently(graph_utils.tarefas_graficos(f)), cube_loaded)
+    casos["charts/tarefa_comparativo_mensal"] = lambda: render_concurrently([graph_utils.tarefa_comparativo_mensal()])
+    for view in CUBES:
+        casos[f"cube/load_cube[{view}]"] = lambda v=view: load_cube(v)
+    casos["cube/dados_explorar_cubo"] = lambda: graph_utils.dados_explorar_cubo(
+        {}, ["nome_empresa", "natureza", "continente_destino"], "Passageiros")
+    casos["cube/dados_explorar_cubo[geografico]"] = lambda: graph_utils.dados_explorar_cubo(
+        {}, ["pais_origem", "uf_origem", "uf_destino"], "Passageiros")
+    st.session_state.clear()
+    return casos
+
+
+def run(scale=10, repeat=5, seed=0, csv_path=CSV_PATH, workdir=None):
+    """
+    Gera dados sintéticos, carrega num banco temporário e mede cada caso de `benchmarks`.
+
+    O banco e o snapshot são criados em `workdir` (um diretório temporário por padrão), de
+    modo que o `anac.db` do projeto não é tocado; o diretório temporário é apagado ao final. Antes de cada execução os caches de
+    consultas e de big numbers são esvaziados, então os tempos são de cache frio; os casos
+    "cubo lido" só mantêm o cubo em memória.
+
+    Args:
+        scale (int, optional): Multiplicador do CSV de base (ver utils.synthetic). Default é 10.
+        repeat (int, optional): Execuções por caso. Default é 5.
+        seed (int, optional): Semente do gerador de dados. Default é 0.
+        csv_path (str, optional): CSV de base. Default é CSV_PATH.
+        workdir (str, optional): Diretório de trabalho. Default é None (temporário).
+
+    Returns:
+        dict: `meta` com a descrição da execução e `results` com as medidas por caso.
+    """
+    from utils.connection import close_pools
+    from utils.synthetic import generate
+
+    csv_path = os.path.abspath(csv_path)
+    temporario = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="anac_bench_")
+    anterior = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        inicio = time.perf_counter()
+        paths = generate("dados", scale, seed, csv_path)
+        print(f"{len(paths)} CSVs sintéticos gerados em {time.perf_counter() - inicio:.2f}s ({workdir})")
+
+        resultados, voos = ingest(paths)
+        for nome, caso in benchmarks().items():
+            func, reset = caso if isinstance(caso, tuple) else (caso, cold_caches)
+            resultados[nome] = measure(func, repeat, reset)
+            print(f"{nome}: {resultados[nome]['median'] * 1000:.1f} ms")
+    finally:
+        close_pools()
+        os.chdir(anterior)
+        if temporario:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    meta = {
+        "scale": scale,
+        "rows": voos,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+    return {"meta": meta, "results": resultados}
+
+
+def elapsed(result):
+    return result.get("median", result.get("seconds"))
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """
+    Compara os tempos com os de uma execução anterior e imprime a razão de cada caso.
+
+    Args:
+        current (dict): Resultado de `run`.
+        baseline (dict): Resultado de referência, no mesmo formato.
+        tolerance (float, optional): Aumento relativo tolerado antes de acusar regressão. Default é TOLERANCE.
+
+    Returns:
+        list: Nomes dos casos que ficaram mais lentos que a tolerância.
+    """
+    regressoes = []
+    base = baseline["results"]
+    largura = max(len(nome) for nome in current["results"])
+    for nome, result in current["results"].items():
+        if nome not in base:
+            print(f"{nome:<{largura}}  (novo)")
+            continue
+        antes, agora = elapsed(base[nome]), elapsed(result)
+        razao = agora / antes if antes else float("inf")
+        marca = ""
+        if razao > 1 + tolerance:
+            regressoes.append(nome)
+            marca = "  REGRESSÃO"
+        print(f"{nome:<{largura}}  {antes * 1000:>9.1f} ms -> {agora * 1000:>9.1f} ms  x{razao:.2f}{marca}")
+    if baseline.get("meta", {}).get("scale") != current["meta"]["scale"]:
+        print("Aviso: a referência foi medida com outra escala")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede carga, consultas e renderização do dashboard com dados sintéticos.")
+    parser.add_argument("--scale", type=int, default=10, help="Multiplicador do CSV de base (10 a 1000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções por caso")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador de dados")
+    parser.add_argument("--csv", default=CSV_PATH, help="CSV de base")
+    parser.add_argument("--workdir", default=None, help="Diretório do banco de teste (padrão: temporário)")
+    parser.add_argument("--output", default=None, help="Arquivo JSON onde gravar os resultados")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Aumento relativo tolerado (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    current = run(args.scale, args.repeat, args.seed, args.csv, args.workdir)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressoes = compare(current, baseline, args.tolerance)
+        if regressoes:
+            print(f"{len(regressoes)} casos mais lentos que a referência além de {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
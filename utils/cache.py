@@ -0,0 +1,180 @@
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_TTL = 600
+
+_memos = []
+
+
+def normalize_sql(query):
+    return " ".join(query.split())
+
+
+def estimate_size(result):
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=False).sum())
+    if isinstance(result, list):
+        if not result:
+            return sys.getsizeof(result)
+        return sys.getsizeof(result) + len(result) * sys.getsizeof(result[0])
+    return sys.getsizeof(result)
+
+
+class QueryCache:
+    """
+    Cache LRU de resultados de consultas, compartilhado por todas as sessões do processo.
+
+    As entradas expiram depois de `ttl` segundos e o cache inteiro é descartado quando
+    a versão dos dados muda. O tamanho total é limitado por uma estimativa em bytes.
+
+    Args:
+        max_bytes (int, optional): Memória máxima estimada das entradas. Default é CACHE_MAX_BYTES.
+        ttl (float, optional): Tempo de vida de cada entrada em segundos. Default é CACHE_TTL.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self.version:
+                self._clear(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            result, size, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result, version):
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version != self.version:
+                self._clear(version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear(None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _clear(self, version):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+        self.version = version
+
+
+def freeze(value):
+    """Chave hashable para argumentos: dicts viram pares ordenados e listas viram tuplas."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def versioned_memo(size, version):
+    """
+    Memoriza os resultados de uma função num LRU descartado quando a versão dos dados muda.
+
+    A chave são os argumentos da chamada já com os defaults, então `f(x)` e `f(x, by=...)`
+    com o valor padrão compartilham a entrada. A função decorada ganha `clear()`, e
+    `clear_memos()` esvazia todas as memorizações do processo.
+
+    Args:
+        size (int): Número máximo de resultados guardados.
+        version (Callable[[], object]): Devolve a versão atual dos dados (ex: get_dataset_version).
+
+    Returns:
+        Callable: Decorador.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        memo = OrderedDict()
+        memo_version = [None]
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = freeze(tuple(bound.arguments.values()))
+            atual = version()
+            with lock:
+                if memo_version[0] != atual:
+                    memo.clear()
+                    memo_version[0] = atual
+                if key in memo:
+                    memo.move_to_end(key)
+                    return memo[key]
+
+            result = func(*args, **kwargs)
+
+            with lock:
+                if memo_version[0] == atual:
+                    memo[key] = result
+                    while len(memo) > size:
+                        memo.popitem(last=False)
+            return result
+
+        def clear():
+            with lock:
+                memo.clear()
+
+        wrapper.clear = clear
+        _memos.append(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def clear_memos():
+    for memo in _memos:
+        memo.clear()
@@ -0,0 +1,459 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from utils.connection import get_pool
+from utils.filters import And, Eq, In, Or, Range, as_filter, compile_filters
+from utils.schema import FLOAT, INTEGER, SCHEMAS, TEXT, integer_dtype, nullable
+
+SNAPSHOT_TABLES = ("RelatorioVoosDetalhado",)
+PARTITIONS = ["ano", "mes"]
+BATCH_SIZE = 50_000
+MANIFEST_FILE = "_manifesto.json"
+SCHEMA_FILE = "_schema"
+
+# Colunas de empresas e aeroportos que as views repetem em cada voo (ver dimension_signatures).
+DIMENSION_COLUMNS = {
+    "empresas": ["sigla", "nome", "nacionalidade"],
+    "aeroportos": ["sigla", "nome", "uf", "regiao", "pais", "continente"],
+}
+
+# O snapshot só é útil para leituras completas da view (ver get_all); o dashboard não o usa,
+# então a exportação na inicialização e nas cargas é opcional.
+SNAPSHOTS_ENABLED = os.environ.get("ANAC_SNAPSHOT", "") not in ("", "0")
+
+_datasets = {}
+_lock = threading.Lock()
+
+
+def snapshot_dir(table, db_path):
+    return os.path.join(os.path.splitext(db_path)[0] + "_parquet", table)
+
+
+def snapshot_columns(conn, table):
+    """
+    Colunas de uma tabela ou view com seu tipo lógico (TEXT, INTEGER ou FLOAT).
+
+    O tipo vem de SCHEMAS quando a tabela tem schema declarado e, nos demais casos,
+    do tipo declarado no SQLite.
+    """
+    schema = SCHEMAS.get(table, {})
+    columns = []
+    for _, name, declared, *_ in conn.execute(f"PRAGMA table_info({table})"):
+        declared = (declared or "").upper()
+        default = FLOAT if declared == "REAL" else INTEGER if declared == "INTEGER" else TEXT
+        columns.append((name, schema.get(name, default)))
+    return columns
+
+
+def snapshot_schema(conn, table, columns):
+    """
+    Monta o schema Arrow do snapshot a partir dos tipos lógicos e dos valores carregados.
+
+    Texto é codificado como dicionário, o que vira `category` no pandas, e cada coluna
+    inteira recebe a menor largura com sinal que comporta seu MIN e MAX no banco.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de leitura.
+        table (str): Nome da tabela ou view.
+        columns (list): Pares (coluna, tipo lógico) de snapshot_columns.
+
+    Returns:
+        pyarrow.Schema: Schema do snapshot.
+    """
+    import pyarrow as pa
+
+    inteiros = [name for name, kind in columns if kind == INTEGER]
+    limites = {}
+    if inteiros:
+        row = conn.execute(f"SELECT {', '.join(f'MIN({c}), MAX({c})' for c in inteiros)} FROM {table}").fetchone()
+        limites = {name: row[2 * i:2 * i + 2] for i, name in enumerate(inteiros)}
+
+    fields = []
+    for name, kind in columns:
+        if kind == TEXT:
+            tipo = pa.dictionary(pa.int32(), pa.string())
+        elif kind == FLOAT:
+            tipo = pa.float64()
+        elif None in limites[name]:
+            tipo = pa.int64()
+        else:
+            tipo = pa.from_numpy_dtype(integer_dtype(*limites[name]))
+        fields.append(pa.field(name, tipo))
+    return pa.schema(fields)
+
+
+def read_manifest(table, db_path):
+    try:
+        with open(os.path.join(snapshot_dir(table, db_path), MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_schema(table, db_path):
+    import pyarrow as pa
+
+    try:
+        with open(os.path.join(snapshot_dir(table, db_path), SCHEMA_FILE), "rb") as f:
+            return pa.ipc.read_schema(pa.py_buffer(f.read()))
+    except OSError:
+        return None
+
+
+def partition_signatures(conn):
+    """
+    Assinatura de cada período carregado: o id da última carga registrada para ele.
+
+    Muda só quando o período é carregado ou substituído. Bancos anteriores ao registro de
+    cargas ficam com assinatura 0.
+
+    Returns:
+        dict: Período (ano * 100 + mes, como texto) -> id da carga.
+    """
+    rows = conn.execute("""
+        SELECT r.periodo, COALESCE(MAX(c.id), 0)
+        FROM resumo_mensal r
+        LEFT JOIN cargas c ON c.ano = r.ano AND c.mes = r.mes
+        GROUP BY r.periodo""").fetchall()
+    return {str(periodo): carga for periodo, carga in rows}
+
+
+def dimension_signatures(conn, limits=None):
+    """
+    Assinatura das linhas de empresas e aeroportos que as views copiam para cada voo.
+
+    Cada tabela é resumida pelo maior id e por um hash das colunas de DIMENSION_COLUMNS até
+    esse id. Linhas novas não mudam o hash das antigas, então só a edição de uma empresa ou
+    aeroporto já exportado exige regravar o snapshot inteiro.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de leitura.
+        limits (dict, optional): Tabela -> maior id a considerar. Default é None (todas as linhas).
+
+    Returns:
+        dict: Tabela -> [maior id, hash].
+    """
+    signatures = {}
+    for table, columns in DIMENSION_COLUMNS.items():
+        limite = (limits or {}).get(table)
+        if limite is None:
+            limite = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        digest = hashlib.sha256()
+        for row in conn.execute(f"SELECT id, {', '.join(columns)} FROM {table} WHERE id <= ? ORDER BY id", (limite,)):
+            digest.update(repr(row).encode())
+        signatures[table] = [limite, digest.hexdigest()]
+    return signatures
+
+
+def partition_path(periodo):
+    periodo = int(periodo)
+    return os.path.join(f"ano={periodo // 100}", f"mes={periodo % 100}")
+
+
+def to_arrow(values, tipo):
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(tipo):
+        return pa.array(values, type=tipo.value_type).dictionary_encode()
+    return pa.array(values, type=tipo)
+
+
+def export_rows(conn, table, schema, destino, periodos=None):
+    """
+    Grava em Parquet, particionado por ano e mês, as linhas de `table` nos períodos pedidos.
+
+    A leitura do SQLite é feita em lotes de BATCH_SIZE linhas, convertidos direto em colunas Arrow.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de leitura.
+        table (str): Nome da tabela ou view, com colunas `ano`, `mes` e `periodo`.
+        schema (pyarrow.Schema): Schema do snapshot.
+        destino (str): Diretório base das partições.
+        periodos (Iterable, optional): Períodos (ano * 100 + mes) a exportar. Default é None (todos).
+
+    Returns:
+        int: Número de linhas exportadas.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    where, params = compile_filters([In("periodo", tuple(int(p) for p in periodos))] if periodos is not None else [])
+    cursor = conn.execute(f"SELECT {', '.join(schema.names)} FROM {table}{f' WHERE {where}' if where else ''}", params)
+    linhas = 0
+
+    def batches():
+        nonlocal linhas
+        while rows := cursor.fetchmany(BATCH_SIZE):
+            linhas += len(rows)
+            arrays = [to_arrow(values, field.type) for field, values in zip(schema, zip(*rows))]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    ds.write_dataset(
+        ds.Scanner.from_batches(batches(), schema=schema),
+        destino,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([schema.field(name) for name in PARTITIONS]), flavor="hive"),
+    )
+    return linhas
+
+
+def write_manifest(directory, schema, manifest):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, SCHEMA_FILE), "wb") as f:
+        f.write(schema.serialize())
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+
+def write_snapshot(table, db_path, version):
+    """
+    Exporta uma tabela ou view inteira para Parquet particionado por ano e mês.
+
+    O snapshot é escrito num diretório temporário e só substitui o anterior ao final, junto
+    com o schema e o manifesto (versão, colunas e assinaturas de períodos e dimensões).
+
+    Args:
+        table (str): Nome da tabela ou view, com colunas `ano`, `mes` e `periodo`.
+        db_path (str): Caminho para o arquivo do banco SQLite.
+        version (int): Versão dos dados exportados (ver get_dataset_version).
+
+    Returns:
+        int: Número de linhas exportadas.
+    """
+    destino = snapshot_dir(table, db_path)
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+
+    with get_pool(db_path).reader() as conn:
+        schema = snapshot_schema(conn, table, snapshot_columns(conn, table))
+        manifest = {
+            "version": version,
+            "columns": schema.names,
+            "partitions": partition_signatures(conn),
+            "dimensions": dimension_signatures(conn),
+        }
+        linhas = export_rows(conn, table, schema, temporario)
+
+    write_manifest(temporario, schema, manifest)
+    with _lock:
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporario, destino)
+        _datasets.pop((table, db_path), None)
+    return linhas
+
+
+def fits_schema(conn, table, schema, periodos):
+    """Verdadeiro se os inteiros dos períodos cabem nas larguras já gravadas no schema do snapshot."""
+    import pyarrow as pa
+
+    inteiros = [field for field in schema if pa.types.is_integer(field.type) and field.name not in PARTITIONS]
+    if not inteiros or not periodos:
+        return True
+    where, params = compile_filters([In("periodo", tuple(int(p) for p in periodos))])
+    row = conn.execute(f"SELECT {', '.join(f'MIN({f.name}), MAX({f.name})' for f in inteiros)} FROM {table} WHERE {where}",
+                       params).fetchone()
+    for i, field in enumerate(inteiros):
+        minimo, maximo = row[2 * i:2 * i + 2]
+        if minimo is not None and integer_dtype(minimo, maximo).itemsize > field.type.bit_width // 8:
+            return False
+    return True
+
+
+def update_snapshot(table, db_path, version):
+    """
+    Atualiza o snapshot regravando só as partições de ano e mês que mudaram desde a exportação.
+
+    Períodos novos ou substituídos são exportados de novo e os removidos são apagados. O
+    snapshot inteiro só é regravado quando não há snapshot, quando as colunas mudam, quando
+    um período novo não cabe nas larguras inteiras do schema gravado ou quando uma empresa
+    ou aeroporto já exportado foi alterado.
+
+    Args:
+        table (str): Nome da tabela ou view, com colunas `ano`, `mes` e `periodo`.
+        db_path (str): Caminho para o arquivo do banco SQLite.
+        version (int): Versão atual dos dados.
+
+    Returns:
+        tuple: (linhas exportadas, partições regravadas ou None quando o snapshot foi regravado inteiro).
+    """
+    destino = snapshot_dir(table, db_path)
+    manifest = read_manifest(table, db_path)
+    schema = read_schema(table, db_path)
+    with get_pool(db_path).reader() as conn:
+        columns = [name for name, _ in snapshot_columns(conn, table)]
+        atual = partition_signatures(conn)
+        alteradas = [p for p, carga in atual.items() if (manifest or {}).get("partitions", {}).get(p) != carga]
+        if (manifest is None or schema is None or manifest.get("columns") != columns
+                or dimension_signatures(conn, {t: s[0] for t, s in manifest["dimensions"].items()}) != manifest["dimensions"]
+                or not fits_schema(conn, table, schema, alteradas)):
+            return write_snapshot(table, db_path, version), None
+
+        removidas = [p for p in manifest["partitions"] if p not in atual]
+        temporario = destino + ".tmp"
+        shutil.rmtree(temporario, ignore_errors=True)
+        linhas = export_rows(conn, table, schema, temporario, alteradas) if alteradas else 0
+        manifest.update(version=version, partitions=atual, dimensions=dimension_signatures(conn))
+
+    with _lock:
+        for periodo in alteradas + removidas:
+            shutil.rmtree(os.path.join(destino, partition_path(periodo)), ignore_errors=True)
+        for periodo in alteradas:
+            origem = os.path.join(temporario, partition_path(periodo))
+            if os.path.isdir(origem):
+                os.makedirs(os.path.dirname(os.path.join(destino, partition_path(periodo))), exist_ok=True)
+                os.replace(origem, os.path.join(destino, partition_path(periodo)))
+        write_manifest(destino, schema, manifest)
+        _datasets.pop((table, db_path), None)
+    shutil.rmtree(temporario, ignore_errors=True)
+    return linhas, alteradas + removidas
+
+
+def ensure_snapshots(db_path, version):
+    """
+    Atualiza os snapshots de SNAPSHOT_TABLES que estejam ausentes ou desatualizados (ver update_snapshot).
+
+    Args:
+        db_path (str): Caminho para o arquivo do banco SQLite.
+        version (int): Versão atual dos dados.
+    """
+    for table in SNAPSHOT_TABLES:
+        manifest = read_manifest(table, db_path)
+        if manifest is not None and manifest.get("version") == version:
+            with get_pool(db_path).reader() as conn:
+                if manifest.get("columns") == [name for name, _ in snapshot_columns(conn, table)]:
+                    continue
+        linhas, particoes = update_snapshot(table, db_path, version)
+        if particoes is None:
+            print(f"Snapshot Parquet de {table} gravado ({linhas} linhas)")
+        elif particoes:
+            print(f"Snapshot Parquet de {table} atualizado: {len(particoes)} partições ({linhas} linhas)")
+
+
+def open_snapshot(table, db_path, version):
+    """
+    Abre o dataset Parquet de uma tabela, desde que esteja na versão informada.
+
+    Returns:
+        pyarrow.dataset.Dataset | None: Dataset particionado, ou None se o snapshot não existir
+        ou for de outra versão dos dados.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    key = (table, db_path)
+    with _lock:
+        cached = _datasets.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        manifest = read_manifest(table, db_path)
+        if manifest is None or manifest.get("version") != version:
+            return None
+        with get_pool(db_path).reader() as conn:
+            names = [name for name, _ in snapshot_columns(conn, table)]
+        if manifest.get("columns") != names:
+            return None
+        schema = read_schema(table, db_path)
+        if schema is None:
+            return None
+        dataset = ds.dataset(
+            snapshot_dir(table, db_path),
+            schema=schema,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([schema.field(name) for name in PARTITIONS]), flavor="hive"),
+            exclude_invalid_files=True,
+        )
+        _datasets[key] = (version, dataset)
+        return dataset
+
+
+def filter_expression(dataset, filters):
+    """
+    Traduz filtros (ver utils.filters) para uma expressão Arrow, aplicada na varredura das partições.
+
+    Args:
+        dataset (pyarrow.dataset.Dataset): Dataset a ser filtrado.
+        filters (Filter | dict | list): Filtros aceitos por `as_filter`.
+
+    Returns:
+        pyarrow.dataset.Expression | None: Expressão equivalente, ou None se algum filtro não
+        puder ser traduzido (colunas desconhecidas, valores de outro tipo).
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    def cast(column, value):
+        tipo = dataset.schema.field(column).type
+        return int(value) if pa.types.is_integer(tipo) else float(value) if pa.types.is_floating(tipo) else str(value)
+
+    def translate(expression):
+        if isinstance(expression, (And, Or)):
+            parts = [translate(f) for f in expression.filters]
+            if any(part is None for part in parts):
+                return None
+            combined = parts[0] if parts else ds.scalar(True)
+            for part in parts[1:]:
+                combined = combined & part if isinstance(expression, And) else combined | part
+            return combined
+        if not isinstance(expression, (Eq, In, Range)) or expression.column not in dataset.schema.names:
+            return None
+        field = ds.field(expression.column)
+        if isinstance(expression, Eq):
+            return field.is_null() if expression.value is None else field == cast(expression.column, expression.value)
+        if isinstance(expression, In):
+            return field.isin([cast(expression.column, v) for v in expression.values])
+        condition = ds.scalar(True)
+        if expression.low is not None:
+            condition = condition & (field >= cast(expression.column, expression.low))
+        if expression.high is not None:
+            condition = condition & (field <= cast(expression.column, expression.high))
+        return condition
+
+    try:
+        return translate(as_filter(filters))
+    except ValueError:
+        return None
+
+
+def read_snapshot(table, fields=["*"], filters=[], db_path=None, version=None):
+    """
+    Lê uma tabela do snapshot Parquet, com projeção de colunas e filtros empurrados para a varredura.
+
+    Colunas numéricas sem nulos chegam ao pandas sem cópia, na largura gravada no snapshot;
+    colunas de texto chegam como `category`, a partir da codificação em dicionário.
+
+    Args:
+        table (str): Nome da tabela ou view.
+        fields (list, optional): Colunas a selecionar. Default é ["*"].
+        filters (Filter | dict | list, optional): Filtros aceitos por `as_filter`. Default é [].
+        db_path (str, optional): Caminho para o arquivo do banco SQLite. Default é None.
+        version (int, optional): Versão atual dos dados. Default é None.
+
+    Returns:
+        pd.DataFrame | None: Resultado, ou None quando a consulta precisa ir ao SQLite.
+    """
+    import pyarrow as pa
+
+    if table not in SNAPSHOT_TABLES or db_path is None:
+        return None
+    dataset = open_snapshot(table, db_path, version)
+    if dataset is None:
+        return None
+    columns = None if list(fields) == ["*"] else list(fields)
+    if columns is not None and not set(columns) <= set(dataset.schema.names):
+        return None
+    expression = filter_expression(dataset, filters) if filters else None
+    if filters and expression is None:
+        return None
+    result = dataset.to_table(columns=columns, filter=expression)
+    schema = result.schema
+    frame = result.to_pandas(split_blocks=True, self_destruct=True)
+    # Inteiros com nulos saem do Arrow como float64; voltam para o dtype anulável da largura original.
+    for field in schema:
+        if pa.types.is_integer(field.type) and frame[field.name].dtype.kind == "f":
+            frame[field.name] = frame[field.name].astype(nullable(np.dtype(field.type.to_pandas_dtype())))
+    return frame
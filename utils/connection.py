@@ -0,0 +1,128 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+CONNECTION_PRAGMAS = [
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -32768",
+    "PRAGMA temp_store = MEMORY",
+]
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Conexões SQLite compartilhadas entre as sessões do Streamlit.
+
+    Mantém um conjunto de conexões somente leitura e uma única conexão de escrita,
+    todas em modo WAL, com os PRAGMAs de conexão aplicados uma única vez na abertura.
+
+    Args:
+        db_path (str): Caminho para o arquivo do banco SQLite.
+        size (int, optional): Máximo de conexões de leitura abertas. Default é POOL_SIZE.
+        cached_statements (int, optional): Tamanho do cache de statements por conexão. Default é STATEMENT_CACHE_SIZE.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, cached_statements=STATEMENT_CACHE_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self.cached_statements = cached_statements
+        self._readers = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        # (versão, instante da leitura), mantido por utils.database.get_dataset_version.
+        self.dataset_version = None
+
+    def _connect(self, read_only=False):
+        if read_only:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=self.cached_statements)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _get_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            return self._writer
+
+    @contextmanager
+    def reader(self):
+        """Empresta uma conexão somente leitura, devolvendo-a ao pool ao final."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                # Garante que o arquivo exista e já esteja em WAL antes de abrir em modo ro.
+                self._get_writer()
+                try:
+                    conn = self._connect(read_only=True)
+                except sqlite3.Error:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Bloqueia e entrega a conexão de escrita. O controle de transação fica com quem chama."""
+        with self._writer_lock:
+            yield self._get_writer()
+
+    def close(self):
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._lock:
+            while not self._readers.empty():
+                self._readers.get_nowait().close()
+            self._opened = 0
+
+
+def get_pool(db_path, size=POOL_SIZE, cached_statements=STATEMENT_CACHE_SIZE):
+    """
+    Retorna o pool do banco informado, criando-o na primeira chamada do processo.
+
+    Args:
+        db_path (str): Caminho para o arquivo do banco SQLite.
+        size (int, optional): Máximo de conexões de leitura. Default é POOL_SIZE.
+        cached_statements (int, optional): Tamanho do cache de statements. Default é STATEMENT_CACHE_SIZE.
+
+    Returns:
+        ConnectionPool: Pool compartilhado para `db_path`.
+    """
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path, size, cached_statements)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
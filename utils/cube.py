@@ -0,0 +1,195 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from utils.database import CUBE_MEASURES, execute_query, get_dataset_version
+from utils.filters import And, Eq, In, Or, Range, as_filter
+
+# Colunas de dimensão da view CuboVoos, sobre resumo_cubo (ver refresh_cube em utils.database).
+# Ano e mês dependem do período, então não aumentam o número de células, mas permitem filtrar por eles.
+CUBE_DIMENSIONS = ["periodo", "ano", "mes", "natureza", "grupo_voo", "nome_empresa", "nacionalidade_empresa",
+                   "continente_origem", "continente_destino"]
+
+# Colunas de dimensão da view CuboGeografico, agregada na leitura a partir de resumo_rota com a
+# localização atual dos aeroportos. Não se cruza com empresa nem natureza.
+GEO_DIMENSIONS = ["periodo", "ano", "mes", "continente_origem", "pais_origem", "uf_origem",
+                  "continente_destino", "pais_destino", "uf_destino"]
+
+# Cubos disponíveis, do mais usado ao mais específico: view -> colunas de dimensão.
+CUBES = {"CuboVoos": CUBE_DIMENSIONS, "CuboGeografico": GEO_DIMENSIONS}
+
+_cache = {"version": None, "cubes": {}}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True, eq=False)
+class Cube:
+    """
+    Cubo de medidas pré-agregadas, uma linha por combinação de dimensões de cada empresa presente nos dados.
+
+    O tamanho depende da cardinalidade das dimensões e não do número de voos, então fatias e
+    agregações são feitas em memória com pandas.
+
+    Attributes:
+        data (pd.DataFrame): Colunas de dimensão (texto como `category`) e de CUBE_MEASURES.
+    """
+
+    data: pd.DataFrame
+
+    def __len__(self):
+        return len(self.data)
+
+    def slice(self, filters):
+        """
+        Células que atendem aos filtros.
+
+        Args:
+            filters (Filter | dict | list): Filtros sobre as dimensões (ver utils.filters).
+
+        Returns:
+            Cube: Novo cubo só com as células selecionadas.
+
+        Raises:
+            ValueError: Se algum filtro usar colunas que não são dimensões do cubo.
+        """
+        expression = as_filter(filters)
+        if expression is None:
+            return self
+        return Cube(self.data[filter_mask(self.data, expression)])
+
+    def rollup(self, by=(), measures=None):
+        """
+        Agrega as medidas pelas dimensões em `by`, somando as demais.
+
+        Grupos com dimensão nula são mantidos, como num GROUP BY.
+
+        Args:
+            by (str | Iterable[str], optional): Dimensões da quebra; vazio soma tudo numa linha. Default é ().
+            measures (list, optional): Medidas de CUBE_MEASURES. Default é None (todas).
+
+        Returns:
+            pd.DataFrame: Uma linha por grupo, com as dimensões e as medidas.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        measures = list(measures or CUBE_MEASURES)
+        if not by:
+            return self.data[measures].sum().to_frame().T
+        # O groupby do pandas custa mais que a soma em cubos deste tamanho: os grupos saem dos
+        # códigos de cada dimensão e as medidas são somadas com bincount.
+        codes, levels = zip(*(dimension_codes(self.data[name]) for name in by))
+        shape = [len(level) for level in levels]
+        groups, inverse = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+        result = {name: level.take(positions) for name, level, positions
+                  in zip(by, levels, np.unravel_index(groups, shape))}
+        for measure in measures:
+            values = self.data[measure]
+            totals = np.bincount(inverse, weights=np.nan_to_num(values.to_numpy(dtype=float)), minlength=len(groups))
+            result[measure] = totals.astype(values.dtype) if values.dtype.kind in "iu" else totals
+        return pd.DataFrame(result)
+
+
+def dimension_codes(values):
+    """
+    Códigos inteiros de uma dimensão, na ordem dos valores, com os nulos num código ao final.
+
+    Returns:
+        tuple: (np.ndarray de códigos, pd.Index dos valores de cada código).
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, level = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, level = pd.factorize(values, sort=True)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(level), codes)
+        level = level.append(pd.Index([None]))
+    return codes, level
+
+
+def filter_mask(frame, expression):
+    """
+    Avalia uma expressão de filtro (ver utils.filters) sobre as colunas de um DataFrame.
+
+    Returns:
+        np.ndarray: Máscara booleana das linhas selecionadas.
+
+    Raises:
+        ValueError: Para filtros não suportados ou colunas que não existem em `frame`.
+    """
+    if isinstance(expression, (And, Or)):
+        masks = [filter_mask(frame, f) for f in expression.filters]
+        if not masks:
+            return np.ones(len(frame), dtype=bool)
+        return np.logical_and.reduce(masks) if isinstance(expression, And) else np.logical_or.reduce(masks)
+    if not isinstance(expression, (Eq, In, Range)) or expression.column not in frame.columns:
+        raise ValueError(f"Filtro não suportado pelo cubo: {expression!r}")
+    values = frame[expression.column]
+    if isinstance(expression, Eq):
+        mask = values.isna() if expression.value is None else values == expression.value
+    elif isinstance(expression, In):
+        mask = values.isin(expression.values)
+    else:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        mask = values.notna()
+        if expression.low is not None:
+            mask &= values >= expression.low
+        if expression.high is not None:
+            mask &= values <= expression.high
+    return mask.to_numpy(dtype=bool)
+
+
+def load_cube(view="CuboVoos"):
+    """
+    Lê um cubo mantido pela carga (ver CUBES), sem reler os voos.
+
+    Args:
+        view (str, optional): View de CUBES. Default é "CuboVoos".
+
+    Returns:
+        Cube: Medidas de CUBE_MEASURES por combinação das dimensões da view.
+    """
+    dimensions = CUBES[view]
+    data = execute_query(f"SELECT {', '.join([*dimensions, *CUBE_MEASURES])} FROM {view}", df=True, cache=False)
+    if data is None or data.empty:
+        data = pd.DataFrame(columns=[*dimensions, *CUBE_MEASURES])
+    for name in dimensions:
+        if data[name].dtype == object:
+            data[name] = data[name].astype("category")
+    data[CUBE_MEASURES] = data[CUBE_MEASURES].apply(pd.to_numeric)
+    return Cube(data)
+
+
+def clear_cube():
+    with _lock:
+        _cache.update(version=None, cubes={})
+
+
+def cube_for(dimensions):
+    """
+    Primeiro cubo de CUBES que tem todas as dimensões pedidas.
+
+    Returns:
+        str | None: Nome da view, ou None se nenhum cubo cruza essas dimensões.
+    """
+    return next((view for view, columns in CUBES.items() if set(dimensions) <= set(columns)), None)
+
+
+def get_cube(view="CuboVoos"):
+    """
+    Cubo de CUBES, lido na primeira fatia pedida.
+
+    O DataFrame fica em memória até que uma nova carga mude a versão dos dados. CuboVoos tem
+    poucas células por mês e atende também os gráficos fixos; CuboGeografico só é lido pelo detalhamento.
+
+    Args:
+        view (str, optional): View de CUBES. Default é "CuboVoos".
+    """
+    version = get_dataset_version()
+    with _lock:
+        if _cache["version"] != version:
+            _cache.update(version=version, cubes={})
+        if view not in _cache["cubes"]:
+            _cache["cubes"][view] = load_cube(view)
+        return _cache["cubes"][view]
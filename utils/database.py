@@ -1,7 +1,33 @@
+import hashlib
+import os
 import sqlite3
+import time
 from unidecode import unidecode
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import streamlit as st
+from utils.cache import QueryCache, normalize_sql
+from utils.columnar import SNAPSHOT_TABLES, SNAPSHOTS_ENABLED, read_snapshot
+from utils.connection import get_pool
+from utils.filters import compile_filters
+from utils.indexes import EXPLAIN_QUERIES, create_indexes, drop_obsolete_indexes, log_query_plan, missing_indexes
+from utils.profiling import current_trace, record_query
+from utils.schema import apply_schema
+
+DB_PATH = 'anac.db'
+CSV_PATH = './data/anac.csv'
+CHUNK_SIZE = 50_000
+FETCH_SIZE = 10_000
+# Segundos em que a versão dos dados lida do banco é reaproveitada. Cargas deste processo a
+# invalidam na hora (ver clear_cache); as de outro processo aparecem depois desse intervalo.
+VERSION_TTL = 2.0
+
+# Colunas de texto com poucos valores distintos, montadas como `category`. Vale também
+# para as variantes com sufixo, como continente_destino e uf_aeroporto_origem.
+CATEGORY_COLUMNS = ("natureza", "grupo_voo", "continente", "uf", "regiao", "pais", "nacionalidade")
+
+query_cache = QueryCache()
 
 def rename_columns(col, parentheses=True):
     nome = col.lower()
@@ -11,10 +37,13 @@ def rename_columns(col, parentheses=True):
     nome = unidecode(nome)
     return nome.replace(' ', '_')
 
-def execute_query(query, params=None, fetch=False, return_columns=False, df=False, db_path='anac.db'):
+def execute_query(query, params=None, fetch=False, return_columns=False, df=False, db_path=DB_PATH, cache=True):
     """
     Executa uma query no banco SQLite.
 
+    Consultas de leitura passam pelo cache de resultados compartilhado, que é
+    invalidado quando uma nova carga muda a versão dos dados.
+
     Args:
         query (str): Comando SQL a ser executado.
         params (tuple, optional): Parâmetros para query parametrizada. Default é None.
@@ -22,72 +51,312 @@ def execute_query(query, params=None, fetch=False, return_columns=False, df=Fals
         return_columns (bool, optional): Se True, retorna os resultados com o nome das colunas. Default é False.
         df (bool, optional): Se True, retorna os resultados como dataframe. Default é False.
         db_path (str, optional): Caminho para o arquivo do banco SQLite. Default é 'anac.csv'
+        cache (bool, optional): Se False, ignora o cache de resultados. Default é True.
 
     Returns:
         list: Resultados da query, se fetch=True. Caso contrário, None.
     """
+    read = fetch or return_columns or df
+    if not (read and cache):
+        return run_query(query, params, fetch, return_columns, df, db_path)
+
+    version = get_dataset_version(db_path)
+    params_key = tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params or ())
+    key = (db_path, normalize_sql(query), params_key, fetch, return_columns, df)
+    result = query_cache.get(key, version)
+    if result is None:
+        result = run_query(query, params, fetch, return_columns, df, db_path)
+        if result is None:
+            return None
+        query_cache.put(key, result, version)
+    elif current_trace() is not None:
+        record_query(None, query, params, len(result), 0.0, cached=True)
+    return copy_result(result)
+
+def copy_result(result):
+    """Cópia rasa de um resultado do cache, para que quem chama possa alterá-lo sem afetar as outras sessões."""
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    return [dict(row) if isinstance(row, dict) else row for row in result]
+
+def run_query(query, params=None, fetch=False, return_columns=False, df=False, db_path=DB_PATH):
+    pool = get_pool(db_path)
+    read = fetch or return_columns or df
     try:
-        with sqlite3.connect(db_path) as conn:
+        with (pool.reader() if read else pool.writer()) as conn:
+            if EXPLAIN_QUERIES and read:
+                log_query_plan(conn, query, params)
+            inicio = time.perf_counter()
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            if fetch or return_columns or df:
-                data = cursor.fetchall()
-                if return_columns or df:
-                    columns = [desc[0] for desc in cursor.description]
-                    result = [dict(zip(columns, row)) for row in data]
-                    if df:
-                        result = pd.DataFrame(result)
-                    return result
-                else:
-                    return data
-            else:
+            if not read:
                 conn.commit()
+                return None
+            timings = {"frame": 0.0}
+            if df:
+                result = frame_from_cursor(cursor, timings=timings)
+            else:
+                result = cursor.fetchall()
+                if return_columns:
+                    montagem = time.perf_counter()
+                    columns = [desc[0] for desc in cursor.description]
+                    result = [dict(zip(columns, row)) for row in result]
+                    timings["frame"] = time.perf_counter() - montagem
+            duracao = time.perf_counter() - inicio
+            record_query(conn, query, params, len(result), duracao - timings["frame"], timings["frame"])
+            return result
     except sqlite3.Error as e:
         print(f"Erro ao executar a query: {e}")
         return None
+
+def is_category_column(name):
+    return any(name == column or name.startswith(column + "_") for column in CATEGORY_COLUMNS)
+
+def column_values(name, values):
+    if is_category_column(name):
+        return pd.Categorical(np.array(values, dtype=object))
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, (int, float)):
+        array = np.array(values)
+        if array.dtype.kind in "iuf":
+            return array
+        try:
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            pass
+    return np.array(values, dtype=object)
+
+def frame_from_rows(rows, columns):
+    """
+    Monta um DataFrame coluna a coluna a partir das tuplas do cursor, sem dicionário por linha.
+
+    Colunas numéricas ganham dtype int64/float64 (nulos viram NaN) e as de CATEGORY_COLUMNS
+    viram `category`.
+
+    Args:
+        rows (list): Tuplas retornadas pelo cursor.
+        columns (list): Nomes das colunas, na ordem do SELECT.
+
+    Returns:
+        pd.DataFrame: Resultado tipado.
+    """
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    data = {i: column_values(name, values) for i, (name, values) in enumerate(zip(columns, zip(*rows)))}
+    frame = pd.DataFrame(data, copy=False)
+    frame.columns = columns
+    return frame
+
+def concat_frames(frames):
+    """Concatena blocos de frame_from_rows preservando `category` e o dtype numérico de cada coluna."""
+    data = {}
+    for i in range(frames[0].shape[1]):
+        parts = [frame.iloc[:, i] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[i] = pd.Series(union_categoricals(parts))
+            continue
+        # Um bloco só com nulos chega como object; não deve rebaixar a coluna numérica inteira.
+        if any(part.dtype.kind in "iuf" for part in parts):
+            parts = [part.astype(float) if part.dtype == object and part.isna().all() else part
+                     for part in parts]
+        data[i] = pd.concat(parts, ignore_index=True)
+    frame = pd.DataFrame(data, copy=False)
+    frame.columns = frames[0].columns
+    return frame
+
+def frame_from_cursor(cursor, chunk_size=FETCH_SIZE, timings=None):
+    """
+    Lê o resultado de um cursor em blocos de `chunk_size` linhas, convertendo cada bloco em colunas tipadas.
+
+    Só um bloco de tuplas fica em memória por vez.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor já executado.
+        chunk_size (int, optional): Linhas por bloco. Default é FETCH_SIZE.
+        timings (dict, optional): Se informado, recebe em "frame" os segundos gastos montando
+            o DataFrame, separados da leitura do cursor. Default é None.
+
+    Returns:
+        pd.DataFrame: Resultado completo.
+    """
+    columns = [desc[0] for desc in cursor.description]
+    frames = []
+    montagem = 0.0
+    while rows := cursor.fetchmany(chunk_size):
+        inicio = time.perf_counter()
+        frames.append(frame_from_rows(rows, columns))
+        montagem += time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    if not frames:
+        frame = pd.DataFrame(columns=columns)
+    else:
+        frame = frames[0] if len(frames) == 1 else concat_frames(frames)
+    if timings is not None:
+        timings["frame"] = montagem + time.perf_counter() - inicio
+    return frame
+
+def cache_stats():
+    return query_cache.stats()
+
+def clear_cache(db_path=DB_PATH):
+    get_pool(db_path).dataset_version = None
+    query_cache.clear()
     
-def get_all(table, fields=["*"], filters=[], df=True):
+def get_all(table, fields=["*"], filters=[], df=True, db_path=DB_PATH):
+    """
+    Busca todos os registros de uma tabela ou view.
+
+    Com `df=True` e ANAC_SNAPSHOT ligado, tabelas que têm snapshot Parquet (ver utils.columnar)
+    são lidas dele quando o snapshot está na versão atual e os filtros podem ser traduzidos para
+    o Arrow. Os demais casos vão ao SQLite. Nos dois caminhos, tabelas com schema declarado (ver utils.schema) saem com os
+    mesmos dtypes compactos: `category` para texto e a menor largura inteira que cabe.
+
+    Args:
+        table (str): Nome da tabela ou view.
+        fields (list, optional): Colunas a selecionar. Default é ["*"].
+        filters (Filter | dict | list, optional): Filtros aplicados no WHERE. Default é [].
+        df (bool, optional): Se True, retorna um DataFrame. Default é True.
+        db_path (str, optional): Caminho para o arquivo do banco SQLite. Default é DB_PATH.
+
+    Returns:
+        pd.DataFrame | list: Registros encontrados.
+    """
+    if df and SNAPSHOTS_ENABLED and table in SNAPSHOT_TABLES:
+        result = read_snapshot(table, fields, filters, db_path, get_dataset_version(db_path))
+        if result is not None:
+            return result
     fields = ", ".join(fields)
-    query = f"SELECT {fields} FROM {table}"
-    if filters:
-        query += " WHERE "+ format_filters(filters)
-    df = execute_query(query, df=df)
+    where, params = where_clause(filters)
+    query = f"SELECT {fields} FROM {table}{where}"
+    df = execute_query(query, params, df=df, db_path=db_path)
+    if isinstance(df, pd.DataFrame):
+        df = apply_schema(df, table)
     return df
 
+def get_dataset_version(db_path=DB_PATH):
+    """
+    Identificador da última carga registrada; muda a cada nova carga ou substituição de período.
+
+    O valor fica guardado no pool por VERSION_TTL segundos, então leituras em cache não
+    voltam ao banco só para conferir a versão.
+    """
+    pool = get_pool(db_path)
+    guardada = pool.dataset_version
+    agora = time.monotonic()
+    if guardada is not None and agora - guardada[1] < VERSION_TTL:
+        return guardada[0]
+    try:
+        with pool.reader() as conn:
+            version = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cargas").fetchone()[0]
+    except sqlite3.Error:
+        return 0
+    pool.dataset_version = (version, agora)
+    return version
+
+def get_columns(table):
+    return [row[1] for row in execute_query(f"PRAGMA table_info({table})", fetch=True)]
+
+def get_page(table, filters=[], order_by="id", descending=False, after=None, page_size=50):
+    """
+    Busca uma página de registros com paginação por chave (keyset), ordenada no banco.
+
+    A ordenação é sempre desempatada pelo id e valores nulos ficam no fim, tanto
+    em ordem crescente quanto decrescente.
+
+    Args:
+        table (str): Tabela ou view com coluna `id`.
+        filters (Filter | dict | list, optional): Filtros aplicados no WHERE. Default é [].
+        order_by (str, optional): Coluna de ordenação. Default é "id".
+        descending (bool, optional): Se True, ordena de forma decrescente. Default é False.
+        after (tuple, optional): (valor de order_by, id) do último registro da página anterior. Default é None.
+        page_size (int, optional): Quantidade de registros por página. Default é 50.
+
+    Returns:
+        pd.DataFrame: Até `page_size` registros a partir do cursor.
+    """
+    op = "<" if descending else ">"
+    direction = "DESC" if descending else "ASC"
+    clause, params = compile_filters(filters)
+    where = [clause] if clause else []
+    params = list(params)
+    if after is not None:
+        value, last_id = after
+        if order_by == "id":
+            where.append(f"id {op} ?")
+            params.append(last_id)
+        elif value is None:
+            where.append(f"({order_by} IS NULL AND id {op} ?)")
+            params.append(last_id)
+        else:
+            where.append(f"({order_by} IS NULL OR {order_by} {op} ? OR ({order_by} = ? AND id {op} ?))")
+            params.extend([value, value, last_id])
+
+    query = f"SELECT * FROM {table}"
+    if where:
+        query += " WHERE " + " AND ".join(f"({clause})" for clause in where)
+    if order_by == "id":
+        query += f" ORDER BY id {direction}"
+    else:
+        query += f" ORDER BY {order_by} IS NULL, {order_by} {direction}, id {direction}"
+    query += " LIMIT ?"
+    params.append(page_size)
+    return execute_query(query, tuple(params), df=True)
+
 def get_count(table, filters=[], group_by=""):
     query = f"SELECT "
     if group_by:
         query += f"{group_by}, "
-    query += f"COUNT(*) FROM {table}"
-    if filters:
-        query += " WHERE "+ format_filters(filters)
+    where, params = where_clause(filters)
+    query += f"COUNT(*) FROM {table}{where}"
     if group_by:
         query += f" GROUP BY {group_by}"
-        return execute_query(query, df=True)
-    return execute_query(query, fetch=True)[0][0]
+        return execute_query(query, params, df=True)
+    return execute_query(query, params, fetch=True)[0][0]
 
 def get_sum(table, fields, filters=[]):
     query_fields = " + ".join(fields)
-    query = f"SELECT SUM({query_fields}) FROM {table}"
-    if filters:
-        query += " WHERE "+ format_filters(filters)
-    return execute_query(query, fetch=True)[0][0]
+    where, params = where_clause(filters)
+    query = f"SELECT SUM({query_fields}) FROM {table}{where}"
+    return execute_query(query, params, fetch=True)[0][0]
     
 def get_mean(table, field, filters=[]):
-    query = f"SELECT AVG({field}) FROM {table}"
-    if filters:
-        query += " WHERE "+ format_filters(filters)
-    return execute_query(query, fetch=True)[0][0]
+    where, params = where_clause(filters)
+    query = f"SELECT AVG({field}) FROM {table}{where}"
+    return execute_query(query, params, fetch=True)[0][0]
+
+def get_aggregate(table, aggregates, filters=[], group_by="", order_by="", df=True):
+    """
+    Calcula várias agregações numa única query, opcionalmente agrupadas.
+
+    Args:
+        table (str): Tabela ou view consultada.
+        aggregates (dict): Nome da coluna de saída -> expressão SQL (ex: {"voos": "SUM(decolagens)"}).
+        filters (Filter | dict | list, optional): Filtros aplicados no WHERE. Default é [].
+        group_by (str, optional): Colunas do GROUP BY. Default é "".
+        order_by (str, optional): Expressão do ORDER BY. Default é "".
+        df (bool, optional): Se True, retorna um dataframe; senão, uma lista de dicts. Default é True.
+
+    Returns:
+        pd.DataFrame | list: Uma linha por grupo, com as colunas do group_by seguidas das agregações.
+    """
+    fields = [f'{expr} AS "{alias}"' for alias, expr in aggregates.items()]
+    if group_by:
+        fields.insert(0, group_by)
+    where, params = where_clause(filters)
+    query = f"SELECT {', '.join(fields)} FROM {table}{where}"
+    if group_by:
+        query += f" GROUP BY {group_by}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return execute_query(query, params, return_columns=True, df=df)
 
 def get_unique(table, field, filters=[]):
-    query = f"SELECT DISTINCT {field} FROM {table}"
-    if filters:
-        query += " WHERE "+ format_filters(filters)
-    query += f" ORDER BY {field} ASC"
-    result = execute_query(query, fetch=True)
+    where, params = where_clause(filters)
+    query = f"SELECT DISTINCT {field} FROM {table}{where} ORDER BY {field} ASC"
+    result = execute_query(query, params, fetch=True)
     result = [item[0] for item in result]
     return result
 
@@ -108,7 +377,20 @@ def create_tables():
         uf TEXT,
         regiao TEXT,
         pais TEXT,
-        continente TEXT
+        continente TEXT,
+        lat REAL,
+        lon REAL
+    )''')
+
+    colunas = get_columns("aeroportos")
+    for coluna in ("lat", "lon"):
+        if coluna not in colunas:
+            execute_query(f"ALTER TABLE aeroportos ADD COLUMN {coluna} REAL")
+
+    # Códigos ICAO que o airportsdata não conhece: não são procurados nem listados de novo.
+    execute_query('''
+    CREATE TABLE IF NOT EXISTS aeroportos_sem_coordenadas (
+        sigla TEXT PRIMARY KEY
     )''')
 
     execute_query('''
@@ -117,6 +399,7 @@ def create_tables():
         empresa_id INTEGER,
         ano INTEGER,
         mes INTEGER,
+        periodo INTEGER,
         aeroporto_origem_id INTEGER,
         aeroporto_destino_id INTEGER,
         natureza TEXT,
@@ -145,127 +428,101 @@ def create_tables():
         FOREIGN KEY (aeroporto_destino_id) REFERENCES aeroportos(id)
     )''')
 
-def escape_value(val):
-    if pd.isna(val):
-        return 'NULL'
-    val_str = str(val).replace("'", "''")
-    return f"'{val_str}'"
+    execute_query('''
+    CREATE TABLE IF NOT EXISTS cargas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        arquivo TEXT,
+        checksum TEXT,
+        ano INTEGER,
+        mes INTEGER,
+        linhas INTEGER,
+        carregado_em TEXT DEFAULT CURRENT_TIMESTAMP
+    )''')
 
-def fill_empresas(df):
-    empresas = df[['EMPRESA (SIGLA)', 'EMPRESA (NOME)', 'EMPRESA (NACIONALIDADE)']].drop_duplicates()
-    empresas.columns = [rename_columns(col) for col in empresas.columns]
-    
-    empresas_dict = empresas.to_dict('index')
-    values = []
-    for item in empresas_dict.values():
-        values.append(f"""(
-            {escape_value(item['sigla'])},
-            {escape_value(item['nome'])},
-            {escape_value(item['nacionalidade'])}
+    for table, dimensions in ROLLUPS.items():
+        columns = {"ano": "INTEGER", "mes": "INTEGER", "periodo": "INTEGER", **dimensions}
+        columns.update({measure: kind for measure, (kind, _) in ROLLUP_MEASURES.items()})
+        execute_query(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {", ".join(f"{column} {kind}" for column, kind in columns.items())},
+            PRIMARY KEY (ano, mes{"".join(f", {dimension}" for dimension in dimensions)})
         )""")
-    
-    query = (f"""
-    INSERT INTO empresas (
-        sigla, 
-        nome, 
-        nacionalidade
-    ) VALUES
-    {" ,".join(values)};
-    """)
-
-    execute_query(query)
-
-def fill_aeroportos(df):
-    aeroportos_origem = df[['AEROPORTO DE ORIGEM (SIGLA)', 'AEROPORTO DE ORIGEM (NOME)', 'AEROPORTO DE ORIGEM (UF)',
-                        'AEROPORTO DE ORIGEM (REGIÃO)', 'AEROPORTO DE ORIGEM (PAÍS)', 'AEROPORTO DE ORIGEM (CONTINENTE)']
-                        ]
-    aeroportos_destino = df[['AEROPORTO DE DESTINO (SIGLA)', 'AEROPORTO DE DESTINO (NOME)', 'AEROPORTO DE DESTINO (UF)',
-                            'AEROPORTO DE DESTINO (REGIÃO)', 'AEROPORTO DE DESTINO (PAÍS)', 'AEROPORTO DE DESTINO (CONTINENTE)']
-                            ]
-    
-    aeroportos_origem.columns = [rename_columns(col) for col in aeroportos_origem.columns]
-    aeroportos_destino.columns = [rename_columns(col) for col in aeroportos_destino.columns]
 
-    aeroportos = pd.concat([aeroportos_origem, aeroportos_destino]).drop_duplicates(ignore_index=True)
-    
-    aeroportos_dict = aeroportos.to_dict('index')
-    values = []
-    for item in aeroportos_dict.values():
-        values.append(f"""(
-            {escape_value(item['sigla'])},
-            {escape_value(item['nome'])},
-            {escape_value(item['uf'])},
-            {escape_value(item['regiao'])},
-            {escape_value(item['pais'])},
-            {escape_value(item['continente'])}
-            )"""
-        )
-
-    query = f"""
-    INSERT INTO aeroportos (
-        sigla,
-        nome,
-        uf,
-        regiao,
-        pais,
-        continente
-    ) VALUES 
-    {" ,".join(values)};
-    """
-    execute_query(query)
+    columns = {"ano": "INTEGER", "mes": "INTEGER", "periodo": "INTEGER"}
+    columns.update({key: kind for key, (kind, _) in CUBE_KEYS.items()})
+    columns.update({measure: ROLLUP_MEASURES[measure][0] for measure in CUBE_MEASURES})
+    # Cubos com outras chaves são descartados e recalculados pela carga (ver missing_cube).
+    if get_columns("resumo_cubo") not in ([], list(columns)):
+        execute_query("DROP TABLE resumo_cubo")
+    execute_query(f"""
+    CREATE TABLE IF NOT EXISTS resumo_cubo (
+        {", ".join(f"{column} {kind}" for column, kind in columns.items())}
+    )""")
+
+    execute_query('''
+    CREATE TABLE IF NOT EXISTS cubo_aeroportos (
+        id INTEGER PRIMARY KEY,
+        continente TEXT
+    )''')
 
-def fill_voos(df):
-    empresas = execute_query("SELECT id, sigla FROM empresas", return_columns=True)
-    empresas = {row['sigla']:row['id'] for row in empresas}
-    aeroportos = execute_query("SELECT id, sigla FROM aeroportos", return_columns=True)
-    aeroportos = {row['sigla']:row['id'] for row in aeroportos}
+    # Resumos anteriores a uma medida: a coluna é criada e os resumos são esvaziados, para
+    # que a carga os recalcule como períodos sem resumo (ver missing_rollups).
+    faltantes = {table: [m for m in ROLLUP_MEASURES if m not in get_columns(table)] for table in ROLLUPS}
+    if any(faltantes.values()):
+        for table, measures in faltantes.items():
+            for measure in measures:
+                execute_query(f"ALTER TABLE {table} ADD COLUMN {measure} {ROLLUP_MEASURES[measure][0]}")
+            execute_query(f"DELETE FROM {table}")
+
+    execute_query(f"""
+    CREATE TABLE IF NOT EXISTS serie_mensal (
+        periodo INTEGER PRIMARY KEY,
+        ano INTEGER,
+        mes INTEGER,
+        {", ".join(f"{metric} REAL, variacao_{metric} REAL" for metric in SERIES_METRICS)}
+    )""")
+
+    # Bancos anteriores à chave de período: a coluna é criada e preenchida uma única vez.
+    for table in ["voos", *ROLLUPS]:
+        if "periodo" not in get_columns(table):
+            execute_query(f"ALTER TABLE {table} ADD COLUMN periodo INTEGER")
+            execute_query(f"UPDATE {table} SET periodo = {PERIOD_KEY}")
+
+    execute_query('''
+    CREATE TABLE IF NOT EXISTS arquivos (
+        caminho TEXT PRIMARY KEY,
+        mtime REAL,
+        tamanho INTEGER,
+        checksum TEXT,
+        verificado_em TEXT DEFAULT CURRENT_TIMESTAMP
+    )''')
 
-    voos = df[["EMPRESA (SIGLA)","ANO", "MÊS", "AEROPORTO DE ORIGEM (SIGLA)", "AEROPORTO DE DESTINO (SIGLA)", "NATUREZA", "GRUPO DE VOO", "PASSAGEIROS PAGOS", "PASSAGEIROS GRÁTIS",
+    execute_query("CREATE UNIQUE INDEX IF NOT EXISTS idx_empresas_sigla ON empresas (sigla)")
+    execute_query("CREATE UNIQUE INDEX IF NOT EXISTS idx_aeroportos_sigla ON aeroportos (sigla)")
+    with get_pool(DB_PATH).writer() as conn, conn:
+        drop_obsolete_indexes(conn)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_voos_periodo ON voos (periodo)")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_resumo_cubo_periodo ON resumo_cubo (periodo)")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_cargas_checksum ON cargas (checksum)")
+
+EMPRESAS_COLUMNS = ['EMPRESA (SIGLA)', 'EMPRESA (NOME)', 'EMPRESA (NACIONALIDADE)']
+
+AEROPORTOS_ORIGEM_COLUMNS = ['AEROPORTO DE ORIGEM (SIGLA)', 'AEROPORTO DE ORIGEM (NOME)', 'AEROPORTO DE ORIGEM (UF)',
+                             'AEROPORTO DE ORIGEM (REGIÃO)', 'AEROPORTO DE ORIGEM (PAÍS)', 'AEROPORTO DE ORIGEM (CONTINENTE)']
+
+AEROPORTOS_DESTINO_COLUMNS = ['AEROPORTO DE DESTINO (SIGLA)', 'AEROPORTO DE DESTINO (NOME)', 'AEROPORTO DE DESTINO (UF)',
+                              'AEROPORTO DE DESTINO (REGIÃO)', 'AEROPORTO DE DESTINO (PAÍS)', 'AEROPORTO DE DESTINO (CONTINENTE)']
+
+# Chave compacta de ano e mês (ex: 202501), em ordem cronológica, para filtros por intervalo.
+PERIOD_KEY = "ano * 100 + mes"
+
+VOOS_COLUMNS = ["EMPRESA (SIGLA)","ANO", "MÊS", "AEROPORTO DE ORIGEM (SIGLA)", "AEROPORTO DE DESTINO (SIGLA)", "NATUREZA", "GRUPO DE VOO", "PASSAGEIROS PAGOS", "PASSAGEIROS GRÁTIS",
        "CARGA PAGA (KG)", "CARGA GRÁTIS (KG)", "CORREIO (KG)", "ASK", "RPK",
        "ATK", "RTK", "COMBUSTÍVEL (LITROS)", "DISTÂNCIA VOADA (KM)",
        "DECOLAGENS", "CARGA PAGA KM", "CARGA GRATIS KM", "CORREIO KM",
-       "ASSENTOS", "PAYLOAD", "HORAS VOADAS", "BAGAGEM (KG)"]] 
+       "ASSENTOS", "PAYLOAD", "HORAS VOADAS", "BAGAGEM (KG)"]
 
-    voos.columns = [rename_columns(col, parentheses=False) for col in voos.columns]
-    voos['horas_voadas'] = voos['horas_voadas'].str.replace(',','.').astype(float)
-    voos_dict = voos.to_dict('index')
-    
-    values = []
-    for item in voos_dict.values():
-        empresa_id = empresas[item['empresa_sigla']]
-        aeroporto_origem_id = aeroportos[item['aeroporto_de_origem_sigla']]
-        aeroporto_destino_id = aeroportos[item['aeroporto_de_destino_sigla']]
-
-        values.append(f"""(
-            {escape_value(empresa_id)},
-            {escape_value(item['ano'])},
-            {escape_value(item['mes'])},
-            {escape_value(aeroporto_origem_id)},
-            {escape_value(aeroporto_destino_id)},
-            {escape_value(item['natureza'])},
-            {escape_value(item['grupo_de_voo'])},
-            {escape_value(item['passageiros_pagos'])},
-            {escape_value(item['passageiros_gratis'])},
-            {escape_value(item['carga_paga_kg'])},
-            {escape_value(item['carga_gratis_kg'])},
-            {escape_value(item['correio_kg'])},
-            {escape_value(item['ask'])},
-            {escape_value(item['rpk'])},
-            {escape_value(item['atk'])},
-            {escape_value(item['rtk'])},
-            {escape_value(item['combustivel_litros'])},
-            {escape_value(item['distancia_voada_km'])},
-            {escape_value(item['decolagens'])},
-            {escape_value(item['carga_paga_km'])},
-            {escape_value(item['carga_gratis_km'])},
-            {escape_value(item['correio_km'])},
-            {escape_value(item['assentos'])},
-            {escape_value(item['payload'])},
-            {escape_value(item['horas_voadas'])},
-            {escape_value(item['bagagem_kg'])}
-        )""")
-
-    query = f"""
+INSERT_VOOS = f"""
     INSERT INTO voos (
         empresa_id,
         ano,
@@ -292,26 +549,451 @@ def fill_voos(df):
         assentos,
         payload,
         horas_voadas,
-        bagagem_kg
-        ) VALUES 
-        {" ,".join(values)};
+        bagagem_kg,
+        periodo
+    ) VALUES ({", ".join(["?"] * (len(VOOS_COLUMNS) + 1))})"""
+
+ROLLUP_MEASURES = {
+    "registros": ("INTEGER", "COUNT(*)"),
+    "passageiros_pagos": ("INTEGER", "SUM(passageiros_pagos)"),
+    "passageiros_gratis": ("INTEGER", "SUM(passageiros_gratis)"),
+    "passageiros": ("INTEGER", "SUM(passageiros_pagos + passageiros_gratis)"),
+    "registros_passageiros": ("INTEGER", "COUNT(passageiros_pagos + passageiros_gratis)"),
+    "decolagens": ("INTEGER", "SUM(decolagens)"),
+    "horas_voadas": ("REAL", "SUM(horas_voadas)"),
+    "combustivel_litros": ("INTEGER", "SUM(combustivel_litros)"),
+    "distancia_voada_km": ("INTEGER", "SUM(distancia_voada_km)"),
+    "carga_paga_kg": ("INTEGER", "SUM(carga_paga_kg)"),
+    "carga_gratis_kg": ("INTEGER", "SUM(carga_gratis_kg)"),
+    # Soma por voo, como a coluna Carga de VariacaoMensal: voos com um dos lados nulo ficam de fora.
+    "carga_paga_gratis_kg": ("INTEGER", "SUM(carga_paga_kg + carga_gratis_kg)"),
+    "correio_kg": ("INTEGER", "SUM(correio_kg)"),
+    "carga_total_kg": ("INTEGER", "SUM(carga_paga_kg + carga_gratis_kg + correio_kg)"),
+    "assentos": ("INTEGER", "SUM(assentos)"),
+    "ask": ("INTEGER", "SUM(ask)"),
+    "rpk": ("INTEGER", "SUM(rpk)"),
+    "atk": ("INTEGER", "SUM(atk)"),
+    "rtk": ("INTEGER", "SUM(rtk)"),
+}
+
+ROLLUPS = {
+    "resumo_mensal": {},
+    "resumo_empresa": {"empresa_id": "INTEGER"},
+    "resumo_rota": {"aeroporto_origem_id": "INTEGER", "aeroporto_destino_id": "INTEGER"},
+    "resumo_natureza": {"natureza": "TEXT", "grupo_voo": "TEXT"},
+}
+
+# Cubo dos gráficos e do detalhamento (ver utils.cube): chave -> (tipo, expressão sobre voos v e
+# aeroportos ao/ad). Guarda o id da empresa, cujo nome e nacionalidade vêm da view CuboVoos.
+# País e UF ficam de fora para manter o cubo pequeno; o continente dos aeroportos é o da carga,
+# e refresh_cube recalcula todos os períodos quando ele muda (ver cubo_aeroportos).
+CUBE_KEYS = {
+    "natureza": ("TEXT", "v.natureza"),
+    "grupo_voo": ("TEXT", "v.grupo_voo"),
+    "empresa_id": ("INTEGER", "v.empresa_id"),
+    "continente_origem": ("TEXT", "ao.continente"),
+    "continente_destino": ("TEXT", "ad.continente"),
+}
+
+CUBE_MEASURES = ["registros", "decolagens", "passageiros", "registros_passageiros", "assentos",
+                 "carga_paga_kg", "combustivel_litros"]
+
+# Métricas da série mensal, calculadas sobre uma linha de resumo_mensal. As razões saem das
+# somas do mês, então novas métricas não exigem reler os voos.
+SERIES_METRICS = {
+    "passageiros": "COALESCE(passageiros_pagos, 0)",
+    "voos": "COALESCE(decolagens, 0)",
+    "combustivel": "COALESCE(combustivel_litros, 0)",
+    "carga": "COALESCE(carga_paga_kg, 0)",
+    "aproveitamento": "1.0 * passageiros / NULLIF(assentos, 0)",
+    "combustivel_por_ask": "1.0 * combustivel_litros / NULLIF(ask, 0)",
+    "rpk_por_ask": "1.0 * rpk / NULLIF(ask, 0)",
+}
+
+# Com WAL, `synchronous = NORMAL` só sincroniza o disco nos checkpoints: a carga fica quase tão
+# rápida quanto com OFF, mas uma queda não corrompe o banco nem deixa em `cargas` um período
+# cujos voos não chegaram ao disco.
+INGEST_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+]
+
+def read_csv_chunks(csv_path=CSV_PATH, chunksize=CHUNK_SIZE):
+    """
+    Lê o CSV da ANAC em blocos, sem carregar o arquivo inteiro na memória.
+
+    Args:
+        csv_path (str, optional): Caminho do CSV. Default é './data/anac.csv'.
+        chunksize (int, optional): Quantidade de linhas por bloco. Default é CHUNK_SIZE.
+
+    Returns:
+        Iterator[pd.DataFrame]: Blocos do CSV com as colunas originais.
+    """
+    return pd.read_csv(csv_path, encoding='latin-1', delimiter=";", chunksize=chunksize,
+                       dtype={"HORAS VOADAS": str})
+
+def prepare_chunk(chunk):
+    empresas = chunk[EMPRESAS_COLUMNS]
+    empresas.columns = [rename_columns(col) for col in empresas.columns]
+    empresas = empresas.drop_duplicates('sigla')
+
+    aeroportos_origem = chunk[AEROPORTOS_ORIGEM_COLUMNS]
+    aeroportos_destino = chunk[AEROPORTOS_DESTINO_COLUMNS]
+    aeroportos_origem.columns = [rename_columns(col) for col in aeroportos_origem.columns]
+    aeroportos_destino.columns = [rename_columns(col) for col in aeroportos_destino.columns]
+    aeroportos = pd.concat([aeroportos_origem, aeroportos_destino]).drop_duplicates('sigla', ignore_index=True)
+
+    voos = chunk[VOOS_COLUMNS].copy()
+    voos.columns = [rename_columns(col, parentheses=False) for col in voos.columns]
+    voos['horas_voadas'] = voos['horas_voadas'].str.replace(',', '.').astype(float)
+    return empresas, aeroportos, voos
+
+def get_ids(conn, table):
+    return dict(conn.execute(f"SELECT sigla, id FROM {table}").fetchall())
+
+UPSERT_EMPRESAS = """
+    INSERT INTO empresas (sigla, nome, nacionalidade) VALUES (?, ?, ?)
+    ON CONFLICT (sigla) DO UPDATE SET
+        nome = excluded.nome,
+        nacionalidade = excluded.nacionalidade"""
+
+UPSERT_AEROPORTOS = """
+    INSERT INTO aeroportos (sigla, nome, uf, regiao, pais, continente) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (sigla) DO UPDATE SET
+        nome = excluded.nome,
+        uf = excluded.uf,
+        regiao = excluded.regiao,
+        pais = excluded.pais,
+        continente = excluded.continente"""
+
+def fill_empresas(conn, empresas, ids):
+    conn.executemany(UPSERT_EMPRESAS, empresas[['sigla', 'nome', 'nacionalidade']].itertuples(index=False, name=None))
+    if not empresas['sigla'].isin(set(ids)).all():
+        ids.update(get_ids(conn, 'empresas'))
+
+def fill_aeroportos(conn, aeroportos, ids):
+    conn.executemany(UPSERT_AEROPORTOS,
+                     aeroportos[['sigla', 'nome', 'uf', 'regiao', 'pais', 'continente']].itertuples(index=False, name=None))
+    if not aeroportos['sigla'].isin(set(ids)).all():
+        ids.update(get_ids(conn, 'aeroportos'))
+
+_airports = [None]
+
+def known_airports():
+    """Base de aeroportos do airportsdata por código ICAO, carregada uma vez por processo."""
+    if _airports[0] is None:
+        import airportsdata
+        _airports[0] = airportsdata.load()
+    return _airports[0]
+
+def resolve_coordinates(conn):
+    """
+    Preenche lat/lon dos aeroportos que ainda não têm coordenadas, a partir do código ICAO.
+
+    Só aeroportos novos são procurados: códigos desconhecidos pelo airportsdata ficam em
+    `aeroportos_sem_coordenadas`, são listados uma única vez, na carga que os trouxe, e
+    ignorados nas seguintes.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita.
+    """
+    pendentes = conn.execute("""
+        SELECT id, sigla FROM aeroportos
+        WHERE (lat IS NULL OR lon IS NULL)
+          AND sigla NOT IN (SELECT sigla FROM aeroportos_sem_coordenadas)""").fetchall()
+    if not pendentes:
+        return
+    airports = known_airports()
+    coordenadas = []
+    desconhecidos = []
+    for id, sigla in pendentes:
+        airport = airports.get(sigla)
+        if airport:
+            coordenadas.append((airport['lat'], airport['lon'], id))
+        else:
+            desconhecidos.append(sigla)
+    conn.executemany("UPDATE aeroportos SET lat = ?, lon = ? WHERE id = ?", coordenadas)
+    conn.executemany("INSERT OR IGNORE INTO aeroportos_sem_coordenadas (sigla) VALUES (?)",
+                     [(sigla,) for sigla in desconhecidos])
+    if desconhecidos:
+        print(f"{len(desconhecidos)} aeroportos sem coordenadas conhecidas: {', '.join(sorted(desconhecidos))}")
+
+def period_key(ano, mes):
+    return ano * 100 + mes
+
+def fill_voos(conn, voos, empresas, aeroportos):
+    voos = voos.assign(
+        empresa_sigla=voos['empresa_sigla'].map(empresas),
+        aeroporto_de_origem_sigla=voos['aeroporto_de_origem_sigla'].map(aeroportos),
+        aeroporto_de_destino_sigla=voos['aeroporto_de_destino_sigla'].map(aeroportos),
+        periodo=period_key(voos['ano'], voos['mes']),
+    )
+    conn.executemany(INSERT_VOOS, voos.itertuples(index=False, name=None))
+    return len(voos)
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+def loaded_periods(conn):
+    periodos = conn.execute("SELECT DISTINCT ano, mes FROM cargas").fetchall()
+    if not periodos:
+        # Bancos carregados antes do registro de cargas não têm entradas em `cargas`.
+        periodos = conn.execute("SELECT DISTINCT ano, mes FROM voos").fetchall()
+    return set(periodos)
+
+def load_csv(conn, csv_path, checksum, chunksize=CHUNK_SIZE, replace=True):
+    chunks = (prepare_chunk(chunk) for chunk in read_csv_chunks(csv_path, chunksize))
+    periodos = load_chunks(conn, chunks, csv_path, checksum, replace)
+    resolve_coordinates(conn)
+    return periodos
+
+def load_chunks(conn, chunks, csv_path, checksum, replace=True):
+    """
+    Grava blocos já preparados por `prepare_chunk` e registra os períodos na tabela `cargas`.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita, com a transação controlada por quem chama.
+        chunks (Iterable[tuple]): Blocos (empresas, aeroportos, voos).
+        csv_path (str): Arquivo de origem, registrado em `cargas`.
+        checksum (str): Checksum do arquivo de origem.
+        replace (bool, optional): Se True, substitui os períodos já carregados. Default é True.
+
+    Returns:
+        dict: Quantidade de voos carregados por período (ano, mês).
+    """
+    periodos = {}
+    existentes = loaded_periods(conn)
+    ignorados = set()
+    empresas = get_ids(conn, 'empresas')
+    aeroportos = get_ids(conn, 'aeroportos')
+    for chunk_empresas, chunk_aeroportos, voos in chunks:
+        for periodo in voos[['ano', 'mes']].drop_duplicates().itertuples(index=False, name=None):
+            if periodo in periodos or periodo in ignorados:
+                continue
+            if periodo in existentes and not replace:
+                ignorados.add(periodo)
+                continue
+            if periodo in existentes:
+                conn.execute("DELETE FROM voos WHERE periodo = ?", (period_key(*periodo),))
+                conn.execute("DELETE FROM cargas WHERE ano = ? AND mes = ?", periodo)
+            periodos[periodo] = 0
+        if ignorados:
+            voos = voos[~pd.MultiIndex.from_frame(voos[['ano', 'mes']]).isin(ignorados)]
+        if voos.empty:
+            continue
+        fill_empresas(conn, chunk_empresas, empresas)
+        fill_aeroportos(conn, chunk_aeroportos, aeroportos)
+        fill_voos(conn, voos, empresas, aeroportos)
+        for periodo, linhas in voos.groupby(['ano', 'mes']).size().items():
+            periodos[periodo] += linhas
+
+    conn.executemany("INSERT INTO cargas (arquivo, checksum, ano, mes, linhas) VALUES (?, ?, ?, ?, ?)",
+                     [(csv_path, checksum, int(ano), int(mes), int(linhas)) for (ano, mes), linhas in periodos.items()])
+    return periodos
+
+def refresh_rollups(conn, periodos):
+    """
+    Recalcula as tabelas de resumo apenas para os períodos (ano, mês) informados.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita, dentro da transação da carga.
+        periodos (Iterable[tuple]): Períodos (ano, mês) que foram carregados ou substituídos.
+    """
+    measures = ", ".join(ROLLUP_MEASURES)
+    expressions = ", ".join(expr for _, expr in ROLLUP_MEASURES.values())
+    for table, dimensions in ROLLUPS.items():
+        keys = ", ".join(["ano", "mes", "periodo", *dimensions])
+        for ano, mes in periodos:
+            conn.execute(f"DELETE FROM {table} WHERE ano = ? AND mes = ?", (ano, mes))
+            conn.execute(f"""
+                INSERT INTO {table} ({keys}, {measures})
+                SELECT {keys}, {expressions}
+                FROM voos
+                WHERE periodo = ?
+                GROUP BY {keys}""", (period_key(int(ano), int(mes)),))
+    refresh_cube(conn, periodos)
+    refresh_series(conn, periodos)
+
+def refresh_cube(conn, periodos):
+    """
+    Recalcula as células de resumo_cubo apenas para os períodos (ano, mês) informados.
+
+    O cubo guarda o continente dos aeroportos, registrado em cubo_aeroportos. Se a carga mudou
+    o continente de algum aeroporto já usado, todos os períodos são recalculados.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita, dentro da transação da carga.
+        periodos (Iterable[tuple]): Períodos (ano, mês) que foram carregados ou substituídos.
+    """
+    alterados = conn.execute("""
+        SELECT COUNT(*)
+        FROM aeroportos AS a
+        INNER JOIN cubo_aeroportos AS c ON c.id = a.id
+        WHERE a.continente IS NOT c.continente""").fetchone()[0]
+    if alterados:
+        periodos = conn.execute("SELECT ano, mes FROM resumo_mensal").fetchall()
+    conn.execute("""
+        INSERT INTO cubo_aeroportos (id, continente)
+        SELECT id, continente FROM aeroportos WHERE true
+        ON CONFLICT (id) DO UPDATE SET continente = excluded.continente
+        WHERE continente IS NOT excluded.continente""")
+    keys = ["v.ano", "v.mes", "v.periodo", *(expr for _, expr in CUBE_KEYS.values())]
+    columns = ", ".join(["ano", "mes", "periodo", *CUBE_KEYS, *CUBE_MEASURES])
+    expressions = ", ".join(ROLLUP_MEASURES[measure][1] for measure in CUBE_MEASURES)
+    for ano, mes in periodos:
+        chave = period_key(int(ano), int(mes))
+        conn.execute("DELETE FROM resumo_cubo WHERE periodo = ?", (chave,))
+        conn.execute(f"""
+            INSERT INTO resumo_cubo ({columns})
+            SELECT {", ".join(keys)}, {expressions}
+            FROM voos AS v
+            INNER JOIN aeroportos AS ao ON v.aeroporto_origem_id = ao.id
+            INNER JOIN aeroportos AS ad ON v.aeroporto_destino_id = ad.id
+            WHERE v.periodo = ?
+            GROUP BY {", ".join(keys)}""", (chave,))
+
+def refresh_series(conn, periodos):
     """
-    execute_query(query)
+    Atualiza a série mensal (`serie_mensal`) a partir de resumo_mensal, só nas linhas afetadas.
 
-def fill_tables(df):
-    if get_count("empresas") == 0:
-        fill_empresas(df)
-    if get_count("aeroportos") == 0:
-        fill_aeroportos(df)
-    if get_count("voos") == 0:
-        fill_voos(df)
+    A variação de um mês depende apenas do mês anterior presente na série, então além dos
+    períodos informados só é recalculada a variação do mês seguinte a cada um deles.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita, dentro da transação da carga.
+        periodos (Iterable[tuple]): Períodos (ano, mês) cujos resumos foram recalculados.
+    """
+    chaves = sorted({period_key(int(ano), int(mes)) for ano, mes in periodos})
+    metrics = ", ".join(SERIES_METRICS)
+    expressions = ", ".join(SERIES_METRICS.values())
+    for chave in chaves:
+        conn.execute("DELETE FROM serie_mensal WHERE periodo = ?", (chave,))
+        conn.execute(f"""
+            INSERT INTO serie_mensal (periodo, ano, mes, {metrics})
+            SELECT periodo, ano, mes, {expressions}
+            FROM resumo_mensal
+            WHERE periodo = ?""", (chave,))
+
+    afetados = set(chaves)
+    for chave in chaves:
+        seguinte = conn.execute("SELECT MIN(periodo) FROM serie_mensal WHERE periodo > ?", (chave,)).fetchone()[0]
+        if seguinte is not None:
+            afetados.add(seguinte)
+    variacoes = ", ".join(
+        f"variacao_{metric} = (SELECT (serie_mensal.{metric} - anterior.{metric}) / NULLIF(anterior.{metric}, 0)"
+        f" FROM serie_mensal AS anterior WHERE anterior.periodo = :anterior)"
+        for metric in SERIES_METRICS)
+    for chave in sorted(afetados):
+        anterior = conn.execute("SELECT MAX(periodo) FROM serie_mensal WHERE periodo < ?", (chave,)).fetchone()[0]
+        conn.execute(f"UPDATE serie_mensal SET {variacoes} WHERE periodo = :periodo",
+                     {"anterior": anterior, "periodo": chave})
+
+def missing_rollups(conn):
+    return loaded_periods(conn) - set(conn.execute("SELECT ano, mes FROM resumo_mensal").fetchall())
+
+def missing_cube(conn):
+    return (set(conn.execute("SELECT ano, mes FROM resumo_mensal").fetchall())
+            - set(conn.execute("SELECT DISTINCT ano, mes FROM resumo_cubo").fetchall()))
+
+def missing_series(conn):
+    return (set(conn.execute("SELECT ano, mes FROM resumo_mensal").fetchall())
+            - set(conn.execute("SELECT ano, mes FROM serie_mensal").fetchall()))
+
+def ensure_derived(conn):
+    """Completa estruturas derivadas que faltem em bancos criados por versões anteriores."""
+    refresh_rollups(conn, missing_rollups(conn))
+    refresh_cube(conn, missing_cube(conn))
+    refresh_series(conn, missing_series(conn))
+    if missing_indexes(conn):
+        create_indexes(conn)
+    if conn.execute("SELECT COUNT(lat) FROM aeroportos").fetchone()[0] == 0:
+        resolve_coordinates(conn)
+
+def stored_file(conn, caminho):
+    return conn.execute("SELECT mtime, tamanho, checksum FROM arquivos WHERE caminho = ?", (caminho,)).fetchone()
+
+def is_unchanged(arquivo, stat):
+    """Verdadeiro se mtime e tamanho batem com o registro em `arquivos` (ver stored_file)."""
+    return arquivo is not None and tuple(arquivo[:2]) == (stat.st_mtime, stat.st_size)
+
+def is_loaded(conn, arquivo, checksum):
+    """Verdadeiro se o conteúdo com este checksum já foi carregado, pelo mesmo caminho ou por outro."""
+    if arquivo is not None and arquivo[2] == checksum:
+        return True
+    return conn.execute("SELECT 1 FROM cargas WHERE checksum = ?", (checksum,)).fetchone() is not None
+
+def remember_file(conn, caminho, stat, checksum):
+    conn.execute("""
+        INSERT INTO arquivos (caminho, mtime, tamanho, checksum) VALUES (?, ?, ?, ?)
+        ON CONFLICT (caminho) DO UPDATE SET
+            mtime = excluded.mtime,
+            tamanho = excluded.tamanho,
+            checksum = excluded.checksum,
+            verificado_em = CURRENT_TIMESTAMP""", (caminho, stat.st_mtime, stat.st_size, checksum))
+
+def fill_tables(csv_path=CSV_PATH, chunksize=CHUNK_SIZE, db_path=DB_PATH, replace=True):
+    """
+    Carrega incrementalmente um CSV da ANAC no banco, em blocos e numa única transação.
+
+    Arquivos já carregados são ignorados sem reler o CSV: se mtime e tamanho batem com a
+    tabela `arquivos`, nem o checksum é recalculado. Períodos (ano, mês) que já
+    existem no banco são substituídos quando `replace` é True, ou mantidos caso contrário.
+    Empresas e aeroportos novos são mesclados com upsert, cada período carregado é
+    registrado na tabela `cargas` e as tabelas de resumo são atualizadas só para esses períodos.
+    Ao final, os índices secundários são garantidos e as estatísticas do planejador atualizadas.
+
+    Args:
+        csv_path (str, optional): Caminho do CSV. Default é './data/anac.csv'.
+        chunksize (int, optional): Quantidade de linhas por bloco. Default é CHUNK_SIZE.
+        db_path (str, optional): Caminho para o arquivo do banco SQLite. Default é 'anac.db'.
+        replace (bool, optional): Se True, substitui os períodos já carregados. Default é True.
+
+    Returns:
+        dict: Quantidade de voos carregados por período (ano, mês).
+    """
+    inicio = time.perf_counter()
+    caminho = os.path.abspath(csv_path)
+    stat = os.stat(csv_path)
+    with get_pool(db_path).writer() as conn:
+        arquivo = stored_file(conn, caminho)
+        inalterado = is_unchanged(arquivo, stat)
+        checksum = arquivo[2] if inalterado else file_checksum(csv_path)
+        if inalterado or is_loaded(conn, arquivo, checksum):
+            print(f"{csv_path} já foi carregado, nada a fazer")
+            with conn:
+                ensure_derived(conn)
+                remember_file(conn, caminho, stat, checksum)
+            clear_cache(db_path)
+            return {}
+        for pragma in INGEST_PRAGMAS:
+            conn.execute(pragma)
+        try:
+            with conn:
+                periodos = load_csv(conn, csv_path, checksum, chunksize, replace)
+                refresh_rollups(conn, periodos.keys() | missing_rollups(conn))
+                refresh_cube(conn, missing_cube(conn))
+                refresh_series(conn, missing_series(conn))
+                create_indexes(conn)
+                remember_file(conn, caminho, stat, checksum)
+        finally:
+            clear_cache(db_path)
+
+    total = sum(periodos.values())
+    duracao = time.perf_counter() - inicio
+    print(f"{total} voos carregados em {duracao:.2f}s ({total / max(duracao, 1e-9):,.0f} linhas/s)")
+    return periodos
 
 def check_view(view):
-    return execute_query(f"SELECT name FROM sqlite_master WHERE type='view' AND name='{view}';", fetch=True)
+    return execute_query("SELECT name, sql FROM sqlite_master WHERE type='view' AND name = ?;", (view,), fetch=True)
 
-def create_views():
-    if not check_view("RelatorioVoosDetalhado"):
-        execute_query('''CREATE VIEW RelatorioVoosDetalhado AS
+VIEWS = {
+    "RelatorioVoosDetalhado": '''CREATE VIEW RelatorioVoosDetalhado AS
                          SELECT
                             v.id,
                             e.sigla AS sigla_empresa,
@@ -319,6 +1001,7 @@ def create_views():
                             e.nacionalidade AS nacionalidade_empresa,
                             v.ano,
                             v.mes,
+                            v.periodo,
                             ao.sigla AS sigla_aeroporto_origem,
                             ao.nome AS nome_aeroporto_origem,
                             ao.uf AS uf_aeroporto_origem,
@@ -359,41 +1042,121 @@ def create_views():
                         INNER JOIN
                             aeroportos AS ao ON v.aeroporto_origem_id = ao.id
                         INNER JOIN
-                            aeroportos AS ad ON v.aeroporto_destino_id = ad.id;''')
+                            aeroportos AS ad ON v.aeroporto_destino_id = ad.id;''',
 
-    if not check_view('RotasVoo'):
-        execute_query('''CREATE VIEW RotasVoo AS
+    "RotasVoo": '''CREATE VIEW RotasVoo AS
                          SELECT
-                            mes,
-                            sigla_aeroporto_origem AS sigla_origem,
-                            nome_aeroporto_origem AS nome_origem,
-                            continente_aeroporto_origem AS continente_origem,
-                            pais_aeroporto_origem AS pais_origem,
-                            sigla_aeroporto_destino AS sigla_destino,
-                            nome_aeroporto_destino AS nome_destino,
-                            continente_aeroporto_destino AS continente_destino,
-                            pais_aeroporto_destino AS pais_destino
+                            r.ano,
+                            r.mes,
+                            r.periodo,
+                            ao.sigla AS sigla_origem,
+                            ao.nome AS nome_origem,
+                            ao.continente AS continente_origem,
+                            ao.pais AS pais_origem,
+                            ao.lat AS lat_origem,
+                            ao.lon AS lon_origem,
+                            ad.sigla AS sigla_destino,
+                            ad.nome AS nome_destino,
+                            ad.continente AS continente_destino,
+                            ad.pais AS pais_destino,
+                            ad.lat AS lat_destino,
+                            ad.lon AS lon_destino,
+                            r.registros,
+                            r.decolagens,
+                            r.passageiros
+                        FROM
+                            resumo_rota AS r
+                        INNER JOIN
+                            aeroportos AS ao ON r.aeroporto_origem_id = ao.id
+                        INNER JOIN
+                            aeroportos AS ad ON r.aeroporto_destino_id = ad.id;''',
+
+    "ResumoEmpresas": f'''CREATE VIEW ResumoEmpresas AS
+                         SELECT
+                            r.ano,
+                            r.mes,
+                            r.periodo,
+                            e.sigla AS sigla_empresa,
+                            e.nome AS nome_empresa,
+                            e.nacionalidade AS nacionalidade_empresa,
+                            {", ".join(f"r.{measure}" for measure in ROLLUP_MEASURES)}
+                        FROM
+                            resumo_empresa AS r
+                        INNER JOIN
+                            empresas AS e ON r.empresa_id = e.id;''',
+
+    "CuboVoos": f'''CREATE VIEW CuboVoos AS
+                         SELECT
+                            c.periodo,
+                            c.ano,
+                            c.mes,
+                            c.natureza,
+                            c.grupo_voo,
+                            e.nome AS nome_empresa,
+                            e.nacionalidade AS nacionalidade_empresa,
+                            c.continente_origem,
+                            c.continente_destino,
+                            {", ".join(f"c.{measure}" for measure in CUBE_MEASURES)}
                         FROM
-                            RelatorioVoosDetalhado;''')
-        
-    if not check_view('VariacaoMensal'):
-        execute_query('''CREATE VIEW VariacaoMensal AS
+                            resumo_cubo AS c
+                        INNER JOIN
+                            empresas AS e ON c.empresa_id = e.id;''',
+
+    "CuboGeografico": f'''CREATE VIEW CuboGeografico AS
                          SELECT
+                            r.periodo,
+                            r.ano,
+                            r.mes,
+                            ao.continente AS continente_origem,
+                            ao.pais AS pais_origem,
+                            ao.uf AS uf_origem,
+                            ad.continente AS continente_destino,
+                            ad.pais AS pais_destino,
+                            ad.uf AS uf_destino,
+                            {", ".join(f"SUM(r.{measure}) AS {measure}" for measure in CUBE_MEASURES)}
+                        FROM
+                            resumo_rota AS r
+                        INNER JOIN
+                            aeroportos AS ao ON r.aeroporto_origem_id = ao.id
+                        INNER JOIN
+                            aeroportos AS ad ON r.aeroporto_destino_id = ad.id
+                        GROUP BY
+                            r.periodo, r.ano, r.mes, ao.continente, ao.pais, ao.uf, ad.continente, ad.pais, ad.uf;''',
+
+    "VariacaoMensal": '''CREATE VIEW VariacaoMensal AS
+                         SELECT
+                            periodo,
+                            ano,
                             mes,
-                            SUM(passageiros_pagos + passageiros_gratis) AS Passageiros,
+                            SUM(passageiros) AS Passageiros,
                             SUM(decolagens) AS Decolagens,
                             SUM(combustivel_litros) AS Combustivel,
-                            SUM(carga_paga_kg + carga_gratis_kg) AS 'Carga'
+                            SUM(carga_paga_gratis_kg) AS 'Carga'
                         FROM
-                            voos
+                            resumo_mensal
                         GROUP BY
-                            mes;''')
+                            periodo, ano, mes;''',
+}
 
-def format_filters(filters, suffix=""):
-    formated = []
-    if isinstance(filters, dict):
-        for c, v in filters.items():
-            formated.append((f"{c+suffix} = '{v}'"))
-    else:
-        formated = filters
-    return " AND ".join(formated)
+def create_views():
+    for view, sql in VIEWS.items():
+        existing = check_view(view)
+        if existing and existing[0][1] == sql:
+            continue
+        if existing:
+            execute_query(f"DROP VIEW {view}")
+        execute_query(sql)
+        clear_cache()
+
+def where_clause(filters):
+    """
+    Monta o WHERE parametrizado de uma consulta (ver utils.filters).
+
+    Args:
+        filters (Filter | dict | list): Filtros aceitos por `as_filter`.
+
+    Returns:
+        tuple: (" WHERE ...", params), ou ("", ()) quando não há filtro.
+    """
+    sql, params = compile_filters(filters)
+    return (f" WHERE {sql}", params) if sql else ("", ())
@@ -0,0 +1,90 @@
+import threading
+
+from utils.database import execute_query, get_dataset_version
+
+FACETS = {
+    "aeroportos": ["sigla", "nome", "uf", "regiao", "pais", "continente"],
+    "empresas": ["sigla", "nome", "nacionalidade"],
+    "voos": ["ano", "mes", "periodo", "natureza", "grupo_voo"],
+}
+
+# As opções de voos saem do resumo por natureza, que tem as mesmas colunas
+# filtráveis, para que a barra lateral nunca leia a tabela de fatos.
+FACET_SOURCES = {"voos": "resumo_natureza"}
+
+_cache = {"version": None, "facets": None}
+_lock = threading.Lock()
+
+
+def build_facets():
+    """
+    Monta o índice de valores distintos das colunas filtráveis e os mapas de dependência do mapa de rotas.
+
+    Returns:
+        dict: `values[tabela][coluna]` com as opções ordenadas e `routes` com os mapas
+        continente -> países de origem, país de origem -> continentes de destino e
+        (país de origem, continente de destino) -> países de destino.
+    """
+    values = {}
+    for table, columns in FACETS.items():
+        source = FACET_SOURCES.get(table, table)
+        values[table] = {}
+        for column in columns:
+            rows = execute_query(f"SELECT DISTINCT {column} FROM {source} WHERE {column} IS NOT NULL ORDER BY {column}",
+                                 fetch=True) or []
+            values[table][column] = [row[0] for row in rows]
+
+    rotas = execute_query("""
+        SELECT DISTINCT continente_origem, pais_origem, continente_destino, pais_destino
+        FROM RotasVoo""", fetch=True) or []
+    routes = {"continente_origem": set(), "pais_origem": {}, "continente_destino": {}, "pais_destino": {}}
+    for continente_origem, pais_origem, continente_destino, pais_destino in rotas:
+        routes["continente_origem"].add(continente_origem)
+        routes["pais_origem"].setdefault(continente_origem, set()).add(pais_origem)
+        routes["continente_destino"].setdefault(pais_origem, set()).add(continente_destino)
+        routes["pais_destino"].setdefault((pais_origem, continente_destino), set()).add(pais_destino)
+    routes["continente_origem"] = sorted_options(routes["continente_origem"])
+    for level in ("pais_origem", "continente_destino", "pais_destino"):
+        routes[level] = {key: sorted_options(options) for key, options in routes[level].items()}
+
+    return {"values": values, "routes": routes}
+
+
+def sorted_options(options):
+    return sorted(option for option in options if option is not None)
+
+
+def clear_facets():
+    with _lock:
+        _cache.update(version=None, facets=None)
+
+
+def get_facets():
+    """Retorna o índice de facetas, reconstruindo-o apenas quando uma nova carga muda a versão dos dados."""
+    version = get_dataset_version()
+    with _lock:
+        if _cache["facets"] is None or _cache["version"] != version:
+            _cache["facets"] = build_facets()
+            _cache["version"] = version
+        return _cache["facets"]
+
+
+def facet_values(table, column):
+    return get_facets()["values"][table][column]
+
+
+def route_options(level, key=None):
+    """
+    Opções de um nível do filtro em cascata do mapa.
+
+    Args:
+        level (str): 'continente_origem', 'pais_origem', 'continente_destino' ou 'pais_destino'.
+        key (str | tuple, optional): Escolha do nível anterior. Default é None.
+
+    Returns:
+        list: Valores possíveis, em ordem alfabética.
+    """
+    routes = get_facets()["routes"]
+    if level == "continente_origem":
+        return routes[level]
+    return routes[level].get(key, [])
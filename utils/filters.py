@@ -0,0 +1,180 @@
+import json
+import re
+from dataclasses import dataclass
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def check_column(column):
+    if not IDENTIFIER.match(column):
+        raise ValueError(f"Nome de coluna inválido em filtro: {column!r}")
+    return column
+
+
+class Filter:
+    """
+    Base das expressões de filtro. Cada expressão compila para um trecho de WHERE com `?`
+    e a tupla de parâmetros correspondente, de modo que o texto SQL dependa só da forma
+    do filtro e não dos valores escolhidos.
+    """
+
+    def compile(self):
+        raise NotImplementedError
+
+    def columns(self):
+        return set()
+
+    def __and__(self, other):
+        return And((self, other))
+
+    def __or__(self, other):
+        return Or((self, other))
+
+
+@dataclass(frozen=True)
+class Eq(Filter):
+    column: str
+    value: object
+
+    def compile(self):
+        column = check_column(self.column)
+        if self.value is None:
+            return f"{column} IS NULL", ()
+        return f"{column} = ?", (self.value,)
+
+    def columns(self):
+        return {self.column}
+
+
+@dataclass(frozen=True)
+class In(Filter):
+    """
+    Pertinência a uma lista de valores. A lista vai num único parâmetro JSON, então o
+    texto da query é o mesmo qualquer que seja a quantidade de valores.
+    """
+
+    column: str
+    values: tuple
+
+    def compile(self):
+        return f"{check_column(self.column)} IN (SELECT value FROM json_each(?))", (json.dumps(list(self.values)),)
+
+    def columns(self):
+        return {self.column}
+
+
+@dataclass(frozen=True)
+class Range(Filter):
+    """Intervalo fechado [low, high]; um dos lados pode ficar em aberto com None."""
+
+    column: str
+    low: object = None
+    high: object = None
+
+    def compile(self):
+        column = check_column(self.column)
+        clauses, params = [], []
+        if self.low is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(self.low)
+        if self.high is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(self.high)
+        return " AND ".join(clauses) or "1", tuple(params)
+
+    def columns(self):
+        return {self.column}
+
+
+@dataclass(frozen=True)
+class And(Filter):
+    filters: tuple
+
+    def compile(self):
+        return join(self.filters, " AND ")
+
+    def columns(self):
+        return set().union(*(f.columns() for f in self.filters))
+
+
+@dataclass(frozen=True)
+class Or(Filter):
+    filters: tuple
+
+    def compile(self):
+        return join(self.filters, " OR ")
+
+    def columns(self):
+        return set().union(*(f.columns() for f in self.filters))
+
+
+def join(filters, operator):
+    compiled = [f.compile() for f in filters]
+    if not compiled:
+        return "1", ()
+    sql = operator.join(f"({clause})" for clause, _ in compiled)
+    return sql, tuple(param for _, params in compiled for param in params)
+
+
+def from_dict(filters, suffix=""):
+    """
+    Converte um dicionário coluna -> valor em filtros de igualdade combinados com AND.
+
+    Listas, tuplas e conjuntos viram `In`.
+
+    Args:
+        filters (dict): Pares coluna -> valor.
+        suffix (str, optional): Sufixo acrescentado a cada coluna (ex: "_aeroporto_origem"). Default é "".
+
+    Returns:
+        And: Expressão combinada.
+    """
+    return And(tuple(
+        In(column + suffix, tuple(value)) if isinstance(value, (list, tuple, set)) else Eq(column + suffix, value)
+        for column, value in filters.items()))
+
+
+def as_filter(filters):
+    """
+    Normaliza os formatos aceitos pelas funções de consulta numa única expressão.
+
+    Args:
+        filters (Filter | dict | list): Expressão, dicionário de igualdades ou lista de
+            expressões, combinadas com AND.
+
+    Returns:
+        Filter | None: Expressão equivalente, ou None se não houver filtro.
+
+    Raises:
+        TypeError: Para trechos de SQL em texto ou itens que não são expressões de filtro.
+    """
+    if not filters:
+        return None
+    if isinstance(filters, Filter):
+        return filters
+    if isinstance(filters, dict):
+        return from_dict(filters)
+    if isinstance(filters, str):
+        raise TypeError(f"Filtros em SQL não são aceitos, use as expressões de utils.filters: {filters!r}")
+    for f in filters:
+        if not isinstance(f, Filter):
+            raise TypeError(f"Filtros em SQL não são aceitos, use as expressões de utils.filters: {f!r}")
+    return And(tuple(filters))
+
+
+def compile_filters(filters):
+    """
+    Compila filtros para um trecho de WHERE parametrizado.
+
+    Returns:
+        tuple: (sql, params). `sql` é "" quando não há filtro.
+    """
+    expression = as_filter(filters)
+    if expression is None:
+        return "", ()
+    return expression.compile()
+
+
+def filter_columns(filters):
+    expression = as_filter(filters)
+    return expression.columns() if expression is not None else set()
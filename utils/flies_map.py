@@ -1,37 +1,101 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 import pydeck as pdk
-import airportsdata as ad
+from utils.database import get_aggregate, get_all
+from utils.facets import route_options
+from utils.filters import from_dict
+from utils.network import route_network
+from utils.profiling import profiled
 
-from utils.database import get_all, get_unique
-
-airports = ad.load()
-
-def get_airport_cord(icao):
-    try:
-        airport = airports[icao]
-        return [airport['lon'], airport['lat']]
-    except:
-        return None
-    
 {'mes':1}
 
-def render_map(ft):
-    filters = map_filter()
-    if ft:
-        filters['mes'] = int(ft)
-    flies = get_all("RotasVoo",df=True, filters=filters)
-
-    flies['cord_origem'] = flies['sigla_origem'].apply(get_airport_cord)
-    flies['cord_destino'] = flies['sigla_destino'].apply(get_airport_cord)
-
+ROUTE_WEIGHTS = {
+    "Decolagens": "decolagens",
+    "Passageiros": "passageiros",
+    "Registros": "registros",
+}
+
+# Nível de detalhe -> quantidade máxima de rotas desenhadas (None desenha todas).
+DETAIL_LEVELS = {
+    "Baixo": 100,
+    "Médio": 500,
+    "Alto": 2000,
+    "Completo": None,
+}
+
+MIN_WIDTH, MAX_WIDTH = 1, 12
+
+HUB_COUNT = 10
+MAX_HOPS = 3
+LOW_COLOR, HIGH_COLOR = [64, 255, 0], [255, 64, 0]
+
+@profiled
+def aggregate_routes(filters, weight="decolagens", top_n=None, minimum=0):
+    """
+    Agrupa as rotas por origem e destino, com pesos de tráfego, largura e cor de cada arco.
+
+    Args:
+        filters (Filter | dict | list): Filtros aplicados em RotasVoo.
+        weight (str, optional): Medida usada como peso ('decolagens', 'passageiros' ou 'registros'). Default é 'decolagens'.
+        top_n (int, optional): Quantidade máxima de rotas, das mais pesadas para as mais leves. Default é None.
+        minimum (int, optional): Peso mínimo para a rota aparecer. Default é 0.
+
+    Returns:
+        pd.DataFrame: Uma linha por rota com coordenadas, pesos, `largura` e `r`, `g`, `b`.
+    """
+    routes = get_aggregate("RotasVoo", {
+        "registros": "SUM(registros)",
+        "decolagens": "COALESCE(SUM(decolagens), 0)",
+        "passageiros": "COALESCE(SUM(passageiros), 0)",
+    }, filters,
+        group_by="sigla_origem, nome_origem, lat_origem, lon_origem, sigla_destino, nome_destino, lat_destino, lon_destino",
+        order_by=f"{weight} DESC")
+    routes = routes.dropna(subset=["lat_origem", "lon_origem", "lat_destino", "lon_destino"])
+    routes = routes[routes[weight] >= minimum].head(top_n)
+
+    pesos = np.sqrt(routes[weight].to_numpy(dtype=float))
+    escala = (pesos - pesos.min()) / (pesos.max() - pesos.min()) if len(pesos) and pesos.max() > pesos.min() else np.ones_like(pesos)
+    routes = routes.assign(largura=MIN_WIDTH + escala * (MAX_WIDTH - MIN_WIDTH))
+    for i, canal in enumerate("rgb"):
+        routes[canal] = (LOW_COLOR[i] + escala * (HIGH_COLOR[i] - LOW_COLOR[i])).round().astype(int)
+    return routes
+
+def map_task(period_filters=[]):
+    """Desenha os filtros do mapa e devolve a tarefa de `render_concurrently` que busca e desenha as rotas."""
+    args = map_controls(period_filters)
+    return st.container(), lambda: aggregate_routes(*args), draw_map
+
+def map_controls(period_filters=[]):
+    """
+    Desenha os filtros e controles do mapa.
+
+    Args:
+        period_filters (list, optional): Filtros de período da barra lateral. Default é [].
+
+    Returns:
+        tuple: Argumentos de `aggregate_routes` (filtros, peso, top_n, mínimo).
+    """
+    filters = list(period_filters)
+    routes = map_filter()
+    if routes:
+        filters.append(from_dict(routes))
+
+    c1, c2, c3 = st.columns(3)
+    weight = ROUTE_WEIGHTS[c1.selectbox("Peso das rotas", list(ROUTE_WEIGHTS), key="peso_rotas")]
+    detail = c2.select_slider("Nível de detalhe", list(DETAIL_LEVELS), value="Médio", key="detalhe_rotas")
+    minimum = c3.number_input("Peso mínimo", min_value=0, value=0, step=1, key="minimo_rotas")
+    return filters, weight, DETAIL_LEVELS[detail], minimum
+
+def draw_map(flies):
     layer = pdk.Layer(
         "ArcLayer",
         flies,
         pickable=True,
-        get_stroke_width=12,
-        get_source_position="cord_origem",
-        get_target_position="cord_destino",
-        get_source_color=[64, 255, 0],
+        get_width="largura",
+        get_source_position="[lon_origem, lat_origem]",
+        get_target_position="[lon_destino, lat_destino]",
+        get_source_color="[r, g, b]",
         get_target_color=[0, 128, 200],
         auto_highlight=True,
     )
@@ -41,12 +105,76 @@ def render_map(ft):
     r = pdk.Deck(
         layers=[layer],
         initial_view_state=view_state,
-        tooltip={"text": "{nome_origem} to {nome_destino}"},
+        tooltip={"text": "{nome_origem} to {nome_destino}\n{decolagens} decolagens, {passageiros} passageiros"},
     )
 
     r.picking_radius = 10
 
     st.pydeck_chart(r)
+    st.caption(f"{len(flies)} rotas exibidas")
+
+def airport_labels():
+    aeroportos = get_all("aeroportos", ["id", "sigla", "nome"])
+    return {int(id): f"{sigla} - {nome}" for id, sigla, nome in aeroportos.itertuples(index=False, name=None)}
+
+def network_task(period_filters=[]):
+    """Desenha os controles da rede de rotas e devolve a tarefa de `render_concurrently` com hubs e alcance."""
+    aeroportos = airport_labels()
+    c1, c2 = st.columns([3, 1])
+    origem = c1.selectbox("Aeroporto de partida", list(aeroportos), index=None, format_func=aeroportos.get,
+                          key="rede_origem")
+    saltos = c2.number_input("Máximo de voos", min_value=1, max_value=MAX_HOPS, value=2, step=1, key="rede_saltos")
+    return st.container(), lambda: network_summary(period_filters, aeroportos, origem, saltos), draw_network
+
+@profiled
+def network_summary(period_filters, aeroportos, origem=None, saltos=2):
+    """
+    Hubs, graus e destinos alcançáveis, calculados sobre o índice da rede (ver utils.network).
+
+    Args:
+        period_filters (list): Filtros de período da barra lateral.
+        aeroportos (dict): Id -> rótulo do aeroporto.
+        origem (int, optional): Aeroporto de partida do alcance. Default é None (sem alcance).
+        saltos (int, optional): Número máximo de voos até o destino. Default é 2.
+
+    Returns:
+        dict: Tamanho da rede, tabela de hubs e, com `origem`, os destinos alcançáveis, com as
+        decolagens da rota direta para os que estão a um voo.
+    """
+    network = route_network(period_filters)
+    hubs = network.hubs(HUB_COUNT)
+    hubs = pd.DataFrame({
+        "Aeroporto": hubs.index.map(aeroportos),
+        "Destinos": hubs["destinos"],
+        "Origens": hubs["origens"],
+        "Decolagens (saída)": hubs["saida"].astype(int),
+        "Decolagens (chegada)": hubs["entrada"].astype(int),
+    })
+    alcance = None
+    if origem is not None:
+        destinos = network.reachable(origem, saltos)
+        diretos = network.neighbors(origem).reindex(destinos.index, fill_value=0)
+        alcance = pd.DataFrame({"Destino": destinos.index.map(aeroportos), "Voos": destinos.to_numpy(),
+                                "Decolagens diretas": diretos.to_numpy(dtype=int)})
+        alcance = alcance.sort_values(["Voos", "Decolagens diretas", "Destino"], ascending=[True, False, True],
+                                      ignore_index=True)
+    return {"aeroportos": network.size, "rotas": network.routes, "hubs": hubs,
+            "origem": aeroportos.get(origem), "saltos": saltos, "alcance": alcance}
+
+def draw_network(dados):
+    c1, c2, c3 = st.columns(3)
+    c1.metric("🛫 Aeroportos", f"{dados['aeroportos']:,}")
+    c2.metric("🔀 Rotas", f"{dados['rotas']:,}")
+    c3.metric("📐 Rotas por aeroporto", f"{dados['rotas'] / dados['aeroportos'] if dados['aeroportos'] else 0:,.2f}")
+
+    st.subheader("🏆 Principais hubs")
+    st.dataframe(dados["hubs"], use_container_width=True, hide_index=True)
+
+    if dados["alcance"] is not None:
+        st.subheader(f"🧭 Destinos a partir de {dados['origem']}")
+        st.caption(f"{len(dados['alcance'])} destinos alcançáveis com até {dados['saltos']} "
+                   f"{'voo' if dados['saltos'] == 1 else 'voos'}")
+        st.dataframe(dados["alcance"], use_container_width=True, hide_index=True)
 
 def map_filter():
     st.header("Filtros")
@@ -55,7 +183,7 @@ def map_filter():
         st.subheader("Origem")
         c1, c2 = st.columns(2)
 
-    continentes = get_unique("RotasVoo", 'continente_origem')
+    continentes = route_options('continente_origem')
     continente_origem = ""
     pais_origem = ""
     continente_destino = ""
@@ -67,7 +195,7 @@ def map_filter():
             filters['continente_origem'] = continente_origem
 
             with c2:
-                paises = get_unique("RotasVoo", 'pais_origem', filters=[f"continente_origem = '{continente_origem}'"])
+                paises = route_options('pais_origem', continente_origem)
                 pais_origem = st.selectbox("País", paises, index=None, key='pais_origem')
 
     if pais_origem:
@@ -77,7 +205,7 @@ def map_filter():
             filters['pais_origem'] = pais_origem
 
 
-            continentes = get_unique("RotasVoo", 'continente_destino', filters=[f"pais_origem = '{pais_origem}'"])
+            continentes = route_options('continente_destino', pais_origem)
 
             with c3:
                 continente_destino = st.selectbox("Continente", continentes, index=None, key='continente_destino')
@@ -86,7 +214,7 @@ def map_filter():
 
         if continente_destino:
             with c4:
-                paises = get_unique("RotasVoo", 'pais_destino', filters={'pais_origem':pais_origem, "continente_destino":continente_destino})
+                paises = route_options('pais_destino', (pais_origem, continente_destino))
                 pais_destino = st.selectbox("País", paises, index=None, key='pais_destino')
                 if pais_destino:
                     filters['pais_destino'] = pais_destino
@@ -1,57 +1,31 @@
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-from sklearn.preprocessing import MinMaxScaler
-
-def calcular_total_passageiros(df):
-    return df["passageiros_pagos"].sum() + df["passageiros_gratis"].sum()
-
-def calcular_total_voos(df):
-    return df["decolagens"].sum()
-
-def calcular_total_horas_voadas(df):
-    return pd.to_numeric(df["horas_voadas"], errors="coerce").fillna(0).sum()
-
-def calcular_total_combustivel(df):
-    return df["combustivel_litros"].sum()
-
-def calcular_total_distancia(df):
-    return df["distancia_voada_km"].sum()
-
-def calcular_carga_total(df):
-    return (df["carga_paga_kg"] + df["carga_gratis_kg"] + df["correio_kg"]).sum()
-
-def calcular_correio_total(df):
-    return df["correio_kg"].sum()
-
-def media_passageiro_voo(df):
-    total_passageiros = calcular_total_passageiros(df)
-    total_voos = calcular_total_voos(df)
-    if total_voos == 0:
-        return 0
-    return total_passageiros / total_voos
-
-def media_combustivel_voo(df):
-    total_combustivel = calcular_total_combustivel(df)
-    total_voos = calcular_total_voos(df)
-    if total_voos == 0:
-        return 0
-    return total_combustivel / total_voos
-   
-def grafico_natureza_voos(df):
-    contagem = df["natureza"].value_counts().reset_index()
+from utils.cube import cube_for, get_cube
+from utils.database import get_aggregate
+from utils.facets import facet_values
+from utils.filters import Eq, Range
+from utils.kpis import compute_kpis
+from utils.profiling import profiled
+from utils.timeseries import min_max, monthly_series
+
+@profiled
+def figura_natureza_voos(filters):
+    contagem = get_aggregate("resumo_natureza", {"Quantidade": "SUM(registros)"}, filters, group_by="natureza")
     contagem.columns = ["Tipo de Voo", "Quantidade"]
     fig = px.pie(contagem, names="Tipo de Voo", values="Quantidade", title="Distribuição de Voos por Natureza")
-    st.plotly_chart(fig)
+    return fig
 
 
-def grafico_assentos_usados(df):
-    df["assentos"] = pd.to_numeric(df["assentos"], errors="coerce").fillna(0)
-    usados = df["passageiros_pagos"] + df["passageiros_gratis"]
-    totais = df["assentos"]
+@profiled
+def figura_assentos_usados(filters):
+    medias = get_aggregate("resumo_mensal", {
+        "ocupados": "1.0 * SUM(passageiros) / SUM(registros_passageiros)",
+        "totais": "1.0 * COALESCE(SUM(assentos), 0) / SUM(registros)",
+    }, filters, df=False)[0]
 
-    media_ocupados = usados.mean()
-    media_totais = totais.mean()
+    media_ocupados = medias["ocupados"] or 0
+    media_totais = medias["totais"] or 0
     media_vagos = media_totais - media_ocupados
 
     dados = pd.DataFrame({
@@ -70,10 +44,11 @@ def grafico_assentos_usados(df):
             "VAGOS": "red"
         }
     )
-    st.plotly_chart(fig)
+    return fig
 
-def grafico_destino_por_continente(df):
-    contagem = df["continente_aeroporto_destino"].value_counts().reset_index()
+@profiled
+def figura_destino_por_continente(filters):
+    contagem = get_cube().slice(filters).rollup("continente_destino", ["registros"])
     contagem.columns = ["Continente de Destino", "Quantidade de Voos"]
 
 
@@ -82,52 +57,27 @@ def grafico_destino_por_continente(df):
                  values="Quantidade de Voos",
                  title="Distribuição de Voos por Continente de Destino")
 
-    st.plotly_chart(fig)
+    return fig
 
-def grafico_voos_por_empresa(df, top_n=3):
-    voos_por_empresa = df.groupby("nome_empresa")["decolagens"].sum().sort_values(ascending=False)
-    top_empresas = voos_por_empresa.head(top_n)
-    outras = voos_por_empresa.iloc[top_n:].sum()
-
-    dados = top_empresas.copy()
-    if outras > 0:
-        dados["OUTRAS"] = outras
-
-    dados = dados.reset_index()
-    dados.columns = ["Empresa", "Decolagens"]
-    
-    color_map = {
-        "AZUL LINHAS AÉREAS BRASILEIRAS S/A": "#3392FF",
-        "TAM LINHAS AÉREAS S.A.": "#FFC300",
-        "GOL LINHAS AÉREAS S.A.(EX-VRG LINHAS AÉREAS S.A.)": "#DBC817",
-        "OUTRAS": "#95A5A6"
-    }
-
-    fig = px.pie(
-        dados,
-        names="Empresa",
-        values="Decolagens",
-        title=f"Top {top_n} Empresas por Número de Voos",
-        color="Empresa",
-        color_discrete_map=color_map
-    )
-
-    st.plotly_chart(fig)
-
-def grafico_grupo_voo(df):
-    dados = df.groupby(["natureza", "grupo_voo"]).size().reset_index(name="Quantidade")
+@profiled
+def figura_grupo_voo(filters):
+    dados = get_cube().slice(filters).rollup(["natureza", "grupo_voo"], ["registros"])
+    dados.columns = ["natureza", "grupo_voo", "Quantidade"]
     fig = px.sunburst(dados, path=["natureza", "grupo_voo"], values="Quantidade",
     title="Distribuição por Natureza e Grupo de Voo")
-    st.plotly_chart(fig)
+    return fig
 
-def grafico_empresa_nacionalidade(df):
-    dados = df["nacionalidade_empresa"].value_counts().reset_index()
+@profiled
+def figura_empresa_nacionalidade(filters):
+    dados = get_cube().slice(filters).rollup("nacionalidade_empresa", ["registros"])
     dados.columns = ["Nacionalidade", "Quantidade"]
     fig = px.pie(dados, names="Nacionalidade", values="Quantidade", title="Empresas por Nacionalidade")
-    st.plotly_chart(fig)
+    return fig
 
-def grafico_voos_por_empresa(df, top_n=3):
-    voos_por_empresa = df.groupby("nome_empresa")["decolagens"].sum().sort_values(ascending=False)
+@profiled
+def figura_voos_por_empresa(filters, top_n=3):
+    voos_por_empresa = get_cube().slice(filters).rollup("nome_empresa", ["decolagens"])
+    voos_por_empresa = voos_por_empresa.set_index("nome_empresa")["decolagens"].sort_values(ascending=False, kind="stable")
     top_empresas = voos_por_empresa.head(top_n)
     outras = voos_por_empresa.iloc[top_n:].sum()
     dados = top_empresas.copy()
@@ -136,83 +86,218 @@ def grafico_voos_por_empresa(df, top_n=3):
     dados = dados.reset_index()
     dados.columns = ["Empresa", "Decolagens"]
     fig = px.pie(dados, names="Empresa", values="Decolagens", title=f"Top {top_n} Empresas por Número de Voos")
-    st.plotly_chart(fig)
-
-def mostrar_big_numbers(df):
+    return fig
+
+# Gráficos da aba, em linhas de dois.
+GRAFICOS = [
+    figura_natureza_voos,
+    figura_assentos_usados,
+    figura_destino_por_continente,
+    figura_voos_por_empresa,
+    figura_grupo_voo,
+    figura_empresa_nacionalidade,
+]
+
+@profiled
+def dados_big_numbers(filters, filtros_anteriores=None):
+    """Totais do período filtrado e, se pedido, os do mesmo período um ano antes."""
+    anteriores = compute_kpis(filtros_anteriores).total if filtros_anteriores is not None else None
+    return compute_kpis(filters).total, anteriores
+
+def tarefa_big_numbers(filters, filtros_anteriores=None):
     st.title("📈 Big Numbers")
+    return st.container(), lambda: dados_big_numbers(filters, filtros_anteriores), desenhar_big_numbers
+
+def desenhar_big_numbers(dados):
+    totais, anteriores = dados
+
+    def variacao(campo):
+        antes = getattr(anteriores, campo) if anteriores is not None else 0
+        return f"{(getattr(totais, campo) - antes) / antes:+.1%} vs. ano anterior" if antes else None
 
     col1, col2, col3 = st.columns(3)
     col4, col5, col6 = st.columns(3)
     col7, col8, col9 = st.columns(3)
 
-    col1.metric("👨‍👩‍👧‍👦Passageiros Totais", f"{calcular_total_passageiros(df):,}")
-    col2.metric("🛫Decolagens Totais", f"{calcular_total_voos(df):,}")
-    col3.metric("⏳Horas Voadas Totais", f"{calcular_total_horas_voadas(df):,.2f}")
-    col4.metric("⛽Combustível Total (L)", f"{calcular_total_combustivel(df):,}")
-    col5.metric("🏔️Média de Passageiros Por Voo", f"{media_passageiro_voo(df):,.2f}")
-    col6.metric("🪽Média de Combustível Por Voo", f"{media_combustivel_voo(df):,.2f}")
-    col7.metric("🗺️Distância Voada Total", f"{calcular_total_distancia(df):,}")
-    col8.metric("📦Carga Total", f"{calcular_carga_total(df):,}")
-    col9.metric("📮Correio Total", f"{calcular_correio_total(df):,}")
-
-def mostrar_graficos(df):
-
-    col1, col2 = st.columns(2)
-    with col1:
-        grafico_natureza_voos(df)
-    with col2:
-        grafico_assentos_usados(df)
-
-    col3, col4 = st.columns(2)
-    with col3:
-        grafico_destino_por_continente(df)
-    with col4:
-        grafico_voos_por_empresa(df)
-
-    col5, col6 = st.columns(2)
-    with col5:
-        grafico_grupo_voo(df)
-    with col6:
-        grafico_empresa_nacionalidade(df)  
-
-def aplicar_filtro_mensal(df):
-    meses_disponiveis = sorted(df["mes"].unique())
+    col1.metric("👨‍👩‍👧‍👦Passageiros Totais", f"{totais.passageiros:,}", variacao("passageiros"))
+    col2.metric("🛫Decolagens Totais", f"{totais.voos:,}", variacao("voos"))
+    col3.metric("⏳Horas Voadas Totais", f"{totais.horas_voadas:,.2f}", variacao("horas_voadas"))
+    col4.metric("⛽Combustível Total (L)", f"{totais.combustivel:,}", variacao("combustivel"))
+    col5.metric("🏔️Média de Passageiros Por Voo", f"{totais.passageiros_por_voo:,.2f}", variacao("passageiros_por_voo"))
+    col6.metric("🪽Média de Combustível Por Voo", f"{totais.combustivel_por_voo:,.2f}", variacao("combustivel_por_voo"))
+    col7.metric("🗺️Distância Voada Total", f"{totais.distancia:,}", variacao("distancia"))
+    col8.metric("📦Carga Total", f"{totais.carga:,}", variacao("carga"))
+    col9.metric("📮Correio Total", f"{totais.correio:,}", variacao("correio"))
+
+def tarefas_graficos(filters):
+    """
+    Reserva o lugar de cada gráfico de GRAFICOS e devolve as tarefas para `render_concurrently`.
+
+    A query e a montagem da figura rodam no pool; a thread do script só desenha.
+    """
+    tarefas = []
+    for i in range(0, len(GRAFICOS), 2):
+        for coluna, figura in zip(st.columns(2), GRAFICOS[i:i + 2]):
+            tarefas.append((coluna, lambda figura=figura: figura(filters), st.plotly_chart))
+    return tarefas
+
+DIMENSOES_CUBO = {
+    "natureza": "Natureza",
+    "grupo_voo": "Grupo de Voo",
+    "nome_empresa": "Empresa",
+    "nacionalidade_empresa": "Nacionalidade da Empresa",
+    "continente_origem": "Continente de Origem",
+    "pais_origem": "País de Origem",
+    "uf_origem": "UF de Origem",
+    "continente_destino": "Continente de Destino",
+    "pais_destino": "País de Destino",
+    "uf_destino": "UF de Destino",
+    "periodo": "Ano-Mês",
+}
+
+MEDIDAS_CUBO = {
+    "Decolagens": "decolagens",
+    "Passageiros": "passageiros",
+    "Carga (Kg)": "carga_paga_kg",
+    "Combustível (L)": "combustivel_litros",
+    "Registros": "registros",
+}
+
+# Células desenhadas no treemap do detalhamento, das maiores para as menores.
+MAX_CELULAS = 500
+
+def tarefa_explorar_cubo(filters):
+    """Desenha os controles do detalhamento e devolve a tarefa de `render_concurrently` que fatia o cubo."""
+    st.subheader("🔎 Detalhamento por Dimensões")
+    c1, c2 = st.columns([3, 1])
+    dimensoes = c1.multiselect("Dimensões, na ordem do detalhamento", list(DIMENSOES_CUBO),
+                               default=["natureza", "grupo_voo"], format_func=DIMENSOES_CUBO.get, key="cubo_dimensoes")
+    medida = c2.selectbox("Medida", list(MEDIDAS_CUBO), key="cubo_medida")
+    return st.container(), lambda: dados_explorar_cubo(filters, dimensoes, medida), desenhar_explorar_cubo
+
+@profiled
+def dados_explorar_cubo(filters, dimensoes, medida):
+    """
+    Agrega uma medida do cubo (ver utils.cube) pelas dimensões escolhidas.
+
+    País e UF vêm do cubo geográfico, que só combina com período e continentes.
+
+    Args:
+        filters (Filter | dict | list): Filtros de período.
+        dimensoes (list): Chaves de DIMENSOES_CUBO, da mais geral para a mais detalhada.
+        medida (str): Chave de MEDIDAS_CUBO.
+
+    Returns:
+        pd.DataFrame | None: Uma linha por combinação, ordenada pela medida, com os nomes de
+        exibição, ou None se nenhum cubo cruza as dimensões escolhidas.
+    """
+    cubo = cube_for(dimensoes)
+    if cubo is None:
+        return None
+    dados = get_cube(cubo).slice(filters).rollup(dimensoes, [MEDIDAS_CUBO[medida]])
+    dados.columns = [*(DIMENSOES_CUBO[d] for d in dimensoes), medida]
+    dados[medida] = dados[medida].astype("int64")
+    if "periodo" in dimensoes:
+        dados[DIMENSOES_CUBO["periodo"]] = dados[DIMENSOES_CUBO["periodo"]].map(formatar_periodo)
+    for coluna in dados.columns[:-1]:
+        dados[coluna] = dados[coluna].astype(object).where(dados[coluna].notna(), "Não informado")
+    return dados.sort_values(medida, ascending=False, ignore_index=True)
+
+def desenhar_explorar_cubo(dados):
+    if dados is None:
+        st.info("País e UF só podem ser combinados com o período e os continentes.")
+        return
+    if len(dados.columns) == 1:
+        st.info("Escolha ao menos uma dimensão.")
+        return
+    *dimensoes, medida = dados.columns
+    celulas = dados[dados[medida] > 0].head(MAX_CELULAS)
+    if len(celulas):
+        st.plotly_chart(px.treemap(celulas, path=dimensoes, values=medida, title=f"{medida} por {' > '.join(dimensoes)}"))
+    if len(celulas) < len(dados):
+        st.caption(f"Treemap com as {len(celulas)} maiores de {len(dados)} combinações")
+    st.dataframe(dados, use_container_width=True, hide_index=True)
+
+def formatar_periodo(periodo):
+    return f"{periodo // 100}-{periodo % 100:02d}"
+
+def aplicar_filtros_periodo():
+    """
+    Desenha os filtros de tempo da barra lateral: intervalo de meses, mês do ano e comparação
+    com o ano anterior.
+
+    O intervalo vira um filtro `Range` sobre a chave `periodo` (ano * 100 + mes), atendido
+    pelos índices dessa coluna.
+
+    Returns:
+        tuple: (filtros, mês selecionado ou 0, filtros do mesmo período um ano antes ou None
+        quando a comparação está desligada).
+    """
+    periodos = facet_values("voos", "periodo")
+    meses_disponiveis = facet_values("voos", "mes")
+    filters = []
+    inicio, fim = (periodos[0], periodos[-1]) if periodos else (None, None)
+    if len(periodos) > 1:
+        inicio, fim = st.sidebar.select_slider(
+            "🗓️ Período", options=periodos, value=(inicio, fim), format_func=formatar_periodo
+        )
+        if (inicio, fim) != (periodos[0], periodos[-1]):
+            filters.append(Range("periodo", inicio, fim))
+
     mes_selecionado = st.sidebar.selectbox(
         "📅 Selecione o Mês: ",
         options=[0] + list(meses_disponiveis),
         format_func=lambda x: "Todos os Meses" if x == 0 else f"Mês {x}"
     )
     if mes_selecionado != 0:
-        df = df[df["mes"] == mes_selecionado]
-    return df, mes_selecionado
-
-def mostrar_comparativo_mensal_percentual(df):
-    meses_disponiveis = sorted(df['mes'].unique())
-    df = df[df["mes"].isin(meses_disponiveis)]
-    df_mes = df.groupby('mes').agg({
-        "passageiros_pagos": "sum",
-        "decolagens": "sum",
-        "combustivel_litros": "sum",
-        "carga_paga_kg": "sum"
-    }).reset_index()
-
-    df_mes = df_mes.sort_values('mes')
-    df_plot = df_mes.set_index('mes')
-    df_plot = df_plot.rename(columns={
-        "passageiros_pagos": "Passageiros",
-        "decolagens": "Voos",
-        "combustivel_litros": "Combustível (L)",
-        "carga_paga_kg": "Carga (Kg)"
-    })
-
-    scaler = MinMaxScaler()
-    df_normalizado = pd.DataFrame(
-        scaler.fit_transform(df_plot),
-        columns=df_plot.columns,
-        index=df_plot.index
-    )
-
-    df_pct = df_plot.pct_change().fillna(0) * 100
+        filters.append(Eq("mes", mes_selecionado))
+
+    filtros_anteriores = None
+    if periodos and st.sidebar.toggle("↔️ Comparar com o ano anterior"):
+        filtros_anteriores = [Range("periodo", inicio - 100, fim - 100)]
+        if mes_selecionado != 0:
+            filtros_anteriores.append(Eq("mes", mes_selecionado))
+    return filters, mes_selecionado, filtros_anteriores
+
+COMPARATIVO_MENSAL = {
+    "passageiros": "Passageiros",
+    "voos": "Voos",
+    "combustivel": "Combustível (L)",
+    "carga": "Carga (Kg)",
+}
+
+EFICIENCIA_MENSAL = {
+    "aproveitamento": "Aproveitamento (pass./assentos)",
+    "rpk_por_ask": "RPK/ASK",
+    "combustivel_por_ask": "Combustível por ASK (L)",
+}
+
+@profiled
+def dados_comparativo_mensal(filters=[]):
+    """
+    Série mensal normalizada, variações percentuais e indicadores de eficiência.
+
+    Os valores vêm de `serie_mensal`, que a carga atualiza só nos meses afetados, então aqui
+    não há agregação nem releitura dos voos.
+
+    Returns:
+        tuple: (normalizado, variação percentual, eficiência), indexados por ano-mês.
+    """
+    valores, variacoes = monthly_series(filters, [*COMPARATIVO_MENSAL, *EFICIENCIA_MENSAL])
+    # Um ponto por ano-mês: janeiros de anos diferentes não se somam e a variação
+    # percentual compara cada mês com o anterior na linha do tempo.
+    valores.index = variacoes.index = valores.index.map(formatar_periodo).rename("periodo")
+
+    df_normalizado = min_max(valores[list(COMPARATIVO_MENSAL)]).rename(columns=COMPARATIVO_MENSAL)
+    df_pct = (variacoes[list(COMPARATIVO_MENSAL)].fillna(0) * 100).rename(columns=COMPARATIVO_MENSAL)
+    df_eficiencia = valores[list(EFICIENCIA_MENSAL)].rename(columns=EFICIENCIA_MENSAL)
+    return df_normalizado, df_pct, df_eficiencia
+
+def tarefa_comparativo_mensal(filters=[]):
+    return st.container(), lambda: dados_comparativo_mensal(filters), desenhar_comparativo_mensal
+
+def desenhar_comparativo_mensal(dados):
+    df_normalizado, df_pct, df_eficiencia = dados
 
     st.subheader("↘️ Variação Mensal ↗️")
     st.line_chart(df_normalizado)
@@ -222,4 +307,11 @@ def mostrar_comparativo_mensal_percentual(df):
         df_pct.style.format("{:.2f}%")
         .highlight_max(axis=0, color='lightgreen')
         .highlight_min(axis=0, color='lightcoral')
-    )
\ No newline at end of file
+    )
+
+    st.subheader("⚙️ Eficiência Mensal")
+    st.dataframe(df_eficiencia.style.format({
+        EFICIENCIA_MENSAL["aproveitamento"]: "{:.1%}",
+        EFICIENCIA_MENSAL["rpk_por_ask"]: "{:.1%}",
+        EFICIENCIA_MENSAL["combustivel_por_ask"]: "{:.4f}",
+    }, na_rep="-"))
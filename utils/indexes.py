@@ -0,0 +1,109 @@
+import os
+import re
+
+EXPLAIN_QUERIES = os.environ.get("ANAC_EXPLAIN", "") not in ("", "0")
+
+INDEXES = {
+    # O índice de período de voos (idx_voos_periodo) é criado junto com a tabela, porque a
+    # carga o usa para substituir e resumir cada período (ver utils.database.create_tables).
+    "idx_voos_natureza": "voos (natureza, grupo_voo, ano, mes)",
+    # Chaves estrangeiras usadas pelos joins de RelatorioVoosDetalhado quando o filtro
+    # parte de uma empresa ou de um aeroporto.
+    "idx_voos_empresa": "voos (empresa_id, ano, mes)",
+    "idx_voos_origem": "voos (aeroporto_origem_id, ano, mes)",
+    "idx_voos_destino": "voos (aeroporto_destino_id, ano, mes)",
+    "idx_aeroportos_local": "aeroportos (continente, pais, uf)",
+    "idx_aeroportos_pais": "aeroportos (pais, continente)",
+    "idx_aeroportos_regiao": "aeroportos (regiao, uf)",
+    "idx_empresas_nacionalidade": "empresas (nacionalidade)",
+    # Filtros em cascata do mapa sobre RotasVoo.
+    "idx_resumo_rota_origem": "resumo_rota (aeroporto_origem_id, aeroporto_destino_id, ano, mes)",
+    "idx_resumo_rota_destino": "resumo_rota (aeroporto_destino_id, ano, mes)",
+    "idx_resumo_rota_mes": "resumo_rota (mes, ano)",
+    "idx_resumo_rota_periodo": "resumo_rota (periodo)",
+    "idx_resumo_mensal_mes": "resumo_mensal (mes, ano)",
+    "idx_resumo_mensal_periodo": "resumo_mensal (periodo)",
+    "idx_resumo_natureza_periodo": "resumo_natureza (periodo)",
+    "idx_resumo_empresa_periodo": "resumo_empresa (periodo)",
+    "idx_resumo_natureza_mes": "resumo_natureza (mes, ano)",
+    "idx_resumo_empresa_mes": "resumo_empresa (mes, ano)",
+}
+
+# Índices de versões anteriores, apagados quando o banco ainda tem a definição antiga: em voos
+# havia três índices de período com nomes que não correspondiam às colunas, e os índices de
+# período dos resumos se chamavam `*_anomes`.
+OBSOLETE_INDEXES = {
+    "idx_voos_periodo": "voos (ano, mes)",
+    "idx_voos_mes": "voos (mes, ano)",
+    "idx_voos_anomes": "voos (periodo)",
+    "idx_resumo_rota_anomes": "resumo_rota (periodo)",
+    "idx_resumo_mensal_anomes": "resumo_mensal (periodo)",
+    "idx_resumo_natureza_anomes": "resumo_natureza (periodo)",
+    "idx_resumo_empresa_anomes": "resumo_empresa (periodo)",
+}
+
+# Varredura de todas as linhas de uma tabela, direto ou por um índice que cobre as colunas
+# (`SCAN e USING COVERING INDEX ...`): nos dois casos cada linha da tabela é visitada e, num
+# join, cada uma delas dispara as buscas das tabelas seguintes.
+FULL_SCAN = re.compile(r"^SCAN (?!sqlite_)(\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+
+
+def create_indexes(conn):
+    """
+    Cria os índices secundários dos caminhos de filtro do dashboard e atualiza as estatísticas.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita.
+    """
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+
+
+def drop_obsolete_indexes(conn):
+    """
+    Apaga os índices de OBSOLETE_INDEXES que ainda existam com a definição antiga.
+
+    Args:
+        conn (sqlite3.Connection): Conexão de escrita.
+    """
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"))
+    for name, target in OBSOLETE_INDEXES.items():
+        if name in existing and " ".join(existing[name].split()).endswith(f"ON {target}"):
+            conn.execute(f"DROP INDEX {name}")
+
+
+def missing_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [name for name in INDEXES if name not in existing]
+
+
+def explain_query_plan(conn, query, params=None):
+    """
+    Retorna as linhas do EXPLAIN QUERY PLAN de uma query.
+
+    Args:
+        conn (sqlite3.Connection): Conexão usada para planejar a query.
+        query (str): Comando SQL.
+        params (tuple, optional): Parâmetros da query. Default é None.
+
+    Returns:
+        list: Descrição de cada passo do plano.
+    """
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    return [match.group(1) for step in plan if (match := FULL_SCAN.match(step))]
+
+
+def log_query_plan(conn, query, params=None):
+    plan = explain_query_plan(conn, query, params)
+    print(f"EXPLAIN QUERY PLAN {' '.join(query.split())}")
+    for step in plan:
+        print(f"    {step}")
+    for table in full_scans(plan):
+        print(f"    ⚠️ Varredura completa em {table}")
+    return plan
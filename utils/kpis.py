@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field, fields
+
+from utils.cache import versioned_memo
+from utils.database import get_aggregate, get_dataset_version
+from utils.filters import filter_columns
+
+KPI_EXPRESSIONS = {
+    "passageiros": "COALESCE(SUM(passageiros_pagos), 0) + COALESCE(SUM(passageiros_gratis), 0)",
+    "voos": "COALESCE(SUM(decolagens), 0)",
+    "horas_voadas": "COALESCE(SUM(horas_voadas), 0)",
+    "combustivel": "COALESCE(SUM(combustivel_litros), 0)",
+    "distancia": "COALESCE(SUM(distancia_voada_km), 0)",
+    "carga": "COALESCE(SUM(carga_total_kg), 0)",
+    "correio": "COALESCE(SUM(correio_kg), 0)",
+}
+
+# Resumos com as mesmas medidas, do mais enxuto ao mais detalhado. O cálculo usa o primeiro
+# que tem todas as colunas de filtro e de quebra pedidas.
+KPI_SOURCES = [
+    ("resumo_mensal", {"ano", "mes", "periodo"}),
+    ("resumo_natureza", {"ano", "mes", "periodo", "natureza", "grupo_voo"}),
+    ("ResumoEmpresas", {"ano", "mes", "periodo", "sigla_empresa", "nome_empresa", "nacionalidade_empresa"}),
+]
+
+MEMO_SIZE = 128
+
+
+@dataclass(frozen=True)
+class Kpis:
+    """Totais exibidos nos big numbers."""
+
+    passageiros: int = 0
+    voos: int = 0
+    horas_voadas: float = 0.0
+    combustivel: int = 0
+    distancia: int = 0
+    carga: int = 0
+    correio: int = 0
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(**{f.name: row[f.name] for f in fields(cls)})
+
+    def __add__(self, other):
+        return Kpis(**{f.name: getattr(self, f.name) + getattr(other, f.name) for f in fields(self)})
+
+    @property
+    def passageiros_por_voo(self):
+        return self.passageiros / self.voos if self.voos else 0
+
+    @property
+    def combustivel_por_voo(self):
+        return self.combustivel / self.voos if self.voos else 0
+
+
+@dataclass(frozen=True)
+class KpiReport:
+    """
+    Resultado de compute_kpis.
+
+    Attributes:
+        total (Kpis): Totais de todos os grupos.
+        by (tuple): Colunas da quebra.
+        breakdown (dict): Valor da quebra -> Kpis. A chave é o próprio valor quando a quebra
+            tem uma coluna e uma tupla quando tem mais de uma.
+    """
+
+    total: Kpis
+    by: tuple = ()
+    breakdown: dict = field(default_factory=dict)
+
+
+def kpi_source(columns):
+    for source, available in KPI_SOURCES:
+        if set(columns) <= available:
+            return source
+    raise ValueError(f"Nenhum resumo tem as colunas {', '.join(sorted(columns))}")
+
+
+@versioned_memo(MEMO_SIZE, get_dataset_version)
+def compute_kpis(filters=None, by=("periodo",)):
+    """
+    Calcula todos os big numbers numa única query, já quebrados por `by`.
+
+    Os totais saem da soma dos grupos, sem segunda consulta. Resultados ficam memorizados
+    pelo estado dos filtros até que uma nova carga mude a versão dos dados.
+
+    Args:
+        filters (Filter | dict | list, optional): Filtros aplicados no WHERE. Default é None.
+        by (tuple, optional): Colunas da quebra; vazio calcula só os totais. Default é ("periodo",).
+
+    Returns:
+        KpiReport: Totais e quebra.
+    """
+    by = tuple(by)
+    columns = set(by) | filter_columns(filters)
+    rows = get_aggregate(kpi_source(columns), KPI_EXPRESSIONS, filters or [], group_by=", ".join(by), df=False) or []
+    if by:
+        breakdown = {}
+        for row in rows:
+            chave = row[by[0]] if len(by) == 1 else tuple(row[coluna] for coluna in by)
+            breakdown[chave] = Kpis.from_row(row)
+        report = KpiReport(sum(breakdown.values(), Kpis()), by, breakdown)
+    else:
+        report = KpiReport(Kpis.from_row(rows[0]) if rows else Kpis())
+    return report
@@ -0,0 +1,176 @@
+import argparse
+import glob
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.columnar import SNAPSHOTS_ENABLED, ensure_snapshots
+from utils.connection import get_pool
+from utils.database import (CHUNK_SIZE, DB_PATH, INGEST_PRAGMAS, clear_cache, create_tables, create_views,
+                            file_checksum, get_dataset_version, is_loaded, is_unchanged, load_chunks,
+                            missing_cube, missing_rollups, missing_series, prepare_chunk, read_csv_chunks,
+                            refresh_cube, refresh_rollups, refresh_series, remember_file, resolve_coordinates,
+                            stored_file)
+from utils.indexes import create_indexes
+
+SIGLA_COLUMNS = ["empresa_sigla", "aeroporto_de_origem_sigla", "aeroporto_de_destino_sigla"]
+
+
+def find_csvs(sources):
+    """
+    Expande diretórios e padrões glob na lista ordenada de CSVs, sem repetições.
+
+    Args:
+        sources (list): Diretórios (lidos recursivamente), padrões glob ou caminhos de arquivo.
+
+    Returns:
+        list: Caminhos dos CSVs, na ordem em que devem ser carregados.
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(glob.glob(os.path.join(source, "**", "*.csv"), recursive=True)))
+        else:
+            paths.extend(sorted(glob.glob(source)))
+    return list(dict.fromkeys(paths))
+
+
+def parse_file(csv_path, chunksize=CHUNK_SIZE):
+    """
+    Lê e limpa um CSV da ANAC. Roda nos processos de trabalho, fora da conexão de escrita.
+
+    As siglas dos voos viram `category`, de modo que o processo de escrita traduz para ids
+    só as categorias distintas, e não cada linha.
+
+    Args:
+        csv_path (str): Caminho do CSV.
+        chunksize (int, optional): Quantidade de linhas por bloco. Default é CHUNK_SIZE.
+
+    Returns:
+        tuple: (checksum, blocos de `prepare_chunk`, duração em segundos).
+    """
+    inicio = time.perf_counter()
+    checksum = file_checksum(csv_path)
+    chunks = []
+    for chunk in read_csv_chunks(csv_path, chunksize):
+        empresas, aeroportos, voos = prepare_chunk(chunk)
+        voos[SIGLA_COLUMNS] = voos[SIGLA_COLUMNS].astype("category")
+        chunks.append((empresas, aeroportos, voos))
+    return checksum, chunks, time.perf_counter() - inicio
+
+
+def parse_in_order(executor, pendentes, chunksize, window):
+    """
+    Distribui `parse_file` pelo pool e devolve os resultados na ordem de `pendentes`.
+
+    No máximo `window` arquivos ficam lidos ou em leitura à frente do escritor, o que
+    limita a memória quando a gravação é mais lenta que a leitura.
+
+    Yields:
+        tuple: (item de `pendentes`, resultado de `parse_file`).
+    """
+    fila = iter(pendentes)
+    futuros = deque((item, executor.submit(parse_file, item[0], chunksize)) for item in itertools.islice(fila, window))
+    while futuros:
+        item, futuro = futuros.popleft()
+        proximo = next(fila, None)
+        if proximo is not None:
+            futuros.append((proximo, executor.submit(parse_file, proximo[0], chunksize)))
+        yield item, futuro.result()
+
+
+def load_files(paths, db_path=DB_PATH, workers=None, chunksize=CHUNK_SIZE, replace=True):
+    """
+    Carrega vários CSVs da ANAC: leitura e limpeza em paralelo, gravação por um único escritor.
+
+    Os arquivos são lidos num pool de processos e gravados na ordem de `paths`, cada um na
+    sua transação, com as tabelas de resumo dos seus períodos. Arquivos já carregados são
+    ignorados como em `fill_tables`. Ao final, índices e estatísticas são atualizados.
+
+    Args:
+        paths (list): Caminhos dos CSVs, na ordem de carga.
+        db_path (str, optional): Caminho para o arquivo do banco SQLite. Default é DB_PATH.
+        workers (int, optional): Processos de leitura. Default é None (um por núcleo).
+        chunksize (int, optional): Quantidade de linhas por bloco. Default é CHUNK_SIZE.
+        replace (bool, optional): Se True, substitui os períodos já carregados. Default é True.
+
+    Returns:
+        list: Um dict por arquivo com `arquivo`, `voos`, `leitura` e `gravacao` (segundos).
+    """
+    resumo = []
+    with get_pool(db_path).writer() as conn:
+        pendentes = []
+        for path in paths:
+            stat = os.stat(path)
+            caminho = os.path.abspath(path)
+            arquivo = stored_file(conn, caminho)
+            if is_unchanged(arquivo, stat):
+                print(f"{path} já foi carregado, nada a fazer")
+                continue
+            pendentes.append((path, caminho, stat, arquivo))
+        if not pendentes:
+            return resumo
+
+        for pragma in INGEST_PRAGMAS:
+            conn.execute(pragma)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                lidos = parse_in_order(executor, pendentes, chunksize, 2 * (workers or os.cpu_count() or 1))
+                for i, ((path, caminho, stat, arquivo), (checksum, chunks, leitura)) in enumerate(lidos, 1):
+                    inicio = time.perf_counter()
+                    periodos = {}
+                    with conn:
+                        if not is_loaded(conn, arquivo, checksum):
+                            periodos = load_chunks(conn, chunks, path, checksum, replace)
+                            refresh_rollups(conn, periodos.keys())
+                        remember_file(conn, caminho, stat, checksum)
+                    gravacao = time.perf_counter() - inicio
+                    voos = sum(periodos.values())
+                    resumo.append({"arquivo": path, "voos": voos, "leitura": leitura, "gravacao": gravacao})
+                    print(f"[{i}/{len(pendentes)}] {path}: {voos} voos (leitura {leitura:.2f}s, gravação {gravacao:.2f}s)")
+            with conn:
+                resolve_coordinates(conn)
+                refresh_rollups(conn, missing_rollups(conn))
+                refresh_cube(conn, missing_cube(conn))
+                refresh_series(conn, missing_series(conn))
+                create_indexes(conn)
+        finally:
+            clear_cache(db_path)
+    return resumo
+
+
+def print_summary(resumo, duracao):
+    largura = max([len("Arquivo")] + [len(item["arquivo"]) for item in resumo])
+    print(f"{'Arquivo':<{largura}}  {'Voos':>10}  {'Leitura':>8}  {'Gravação':>8}")
+    for item in resumo:
+        print(f"{item['arquivo']:<{largura}}  {item['voos']:>10,}  {item['leitura']:>7.2f}s  {item['gravacao']:>7.2f}s")
+    total = sum(item["voos"] for item in resumo)
+    print(f"{len(resumo)} arquivos, {total:,} voos em {duracao:.2f}s ({total / max(duracao, 1e-9):,.0f} linhas/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carrega CSVs da ANAC em paralelo no banco do dashboard.")
+    parser.add_argument("sources", nargs="+", help="Diretórios, padrões glob ou arquivos CSV")
+    parser.add_argument("--workers", type=int, default=None, help="Processos de leitura (padrão: um por núcleo)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="Linhas por bloco de leitura")
+    parser.add_argument("--keep", action="store_true", help="Mantém os períodos já carregados em vez de substituí-los")
+    args = parser.parse_args(argv)
+
+    paths = find_csvs(args.sources)
+    if not paths:
+        parser.error("nenhum CSV encontrado")
+
+    inicio = time.perf_counter()
+    create_tables()
+    resumo = load_files(paths, workers=args.workers, chunksize=args.chunksize, replace=not args.keep)
+    create_views()
+    if SNAPSHOTS_ENABLED:
+        ensure_snapshots(DB_PATH, get_dataset_version())
+    if resumo:
+        print_summary(resumo, time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    main()
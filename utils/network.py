@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import versioned_memo
+from utils.database import get_aggregate, get_dataset_version
+
+ROUTE_WEIGHTS = {
+    "registros": "SUM(registros)",
+    "decolagens": "COALESCE(SUM(decolagens), 0)",
+    "passageiros": "COALESCE(SUM(passageiros), 0)",
+}
+
+MEMO_SIZE = 16
+
+
+@dataclass(frozen=True, eq=False)
+class RouteNetwork:
+    """
+    Rede de rotas em formato CSR (compressed sparse row).
+
+    Os aeroportos ficam em posições 0..n-1, na ordem crescente de id. Os destinos da posição
+    `i` são `indices[indptr[i]:indptr[i + 1]]` e os pesos de cada rota estão nas mesmas
+    posições dos arrays de `weights`.
+
+    Attributes:
+        airports (np.ndarray): Ids dos aeroportos, ordenados.
+        indptr (np.ndarray): Início das rotas de cada aeroporto em `indices`, com n + 1 posições.
+        indices (np.ndarray): Posição do aeroporto de destino de cada rota.
+        weights (dict): Medida (ver ROUTE_WEIGHTS) -> array com o peso de cada rota.
+    """
+
+    airports: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    weights: dict
+
+    @classmethod
+    def from_edges(cls, origins, destinations, weights):
+        """
+        Monta a rede a partir de listas de rotas, uma por par (origem, destino).
+
+        Args:
+            origins (array-like): Id do aeroporto de origem de cada rota.
+            destinations (array-like): Id do aeroporto de destino de cada rota.
+            weights (dict): Medida -> pesos das rotas, na mesma ordem.
+
+        Returns:
+            RouteNetwork: Rede com as rotas ordenadas por origem e destino.
+        """
+        origins = np.asarray(origins, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        airports = np.union1d(origins, destinations)
+        rows = np.searchsorted(airports, origins)
+        columns = np.searchsorted(airports, destinations)
+        order = np.lexsort((columns, rows))
+        indptr = np.zeros(len(airports) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(airports)), out=indptr[1:])
+        return cls(
+            airports=airports,
+            indptr=indptr,
+            indices=columns[order].astype(np.int32),
+            weights={name: np.asarray(values, dtype=np.float64)[order] for name, values in weights.items()},
+        )
+
+    @property
+    def size(self):
+        return len(self.airports)
+
+    @property
+    def routes(self):
+        return len(self.indices)
+
+    def position(self, airport_id):
+        """Posição do aeroporto nos arrays, ou None se ele não tem rotas na rede."""
+        i = int(np.searchsorted(self.airports, airport_id))
+        return i if i < self.size and self.airports[i] == airport_id else None
+
+    def neighbors(self, airport_id, weight="decolagens"):
+        """
+        Destinos diretos de um aeroporto.
+
+        Returns:
+            pd.Series: Peso da rota indexado pelo id do destino, vazia se o aeroporto não está na rede.
+        """
+        i = self.position(airport_id)
+        if i is None:
+            return pd.Series(dtype=np.float64, name=weight)
+        inicio, fim = self.indptr[i], self.indptr[i + 1]
+        return pd.Series(self.weights[weight][inicio:fim], index=self.airports[self.indices[inicio:fim]], name=weight)
+
+    def degree_stats(self, weight="decolagens"):
+        """
+        Graus e tráfego de cada aeroporto.
+
+        Args:
+            weight (str, optional): Medida somada no tráfego. Default é 'decolagens'.
+
+        Returns:
+            pd.DataFrame: Indexado pelo id do aeroporto, com `destinos` (grau de saída),
+            `origens` (grau de entrada), `saida` e `entrada` (tráfego) e `total`.
+        """
+        rows = np.repeat(np.arange(self.size), np.diff(self.indptr))
+        pesos = self.weights[weight]
+        stats = pd.DataFrame({
+            "destinos": np.diff(self.indptr),
+            "origens": np.bincount(self.indices, minlength=self.size),
+            "saida": np.bincount(rows, weights=pesos, minlength=self.size),
+            "entrada": np.bincount(self.indices, weights=pesos, minlength=self.size),
+        }, index=pd.Index(self.airports, name="id"))
+        stats["total"] = stats["saida"] + stats["entrada"]
+        return stats
+
+    def hubs(self, top_n=10, weight="decolagens"):
+        """Aeroportos com mais tráfego, com o número de conexões diretas como desempate."""
+        stats = self.degree_stats(weight)
+        stats["conexoes"] = stats["destinos"] + stats["origens"]
+        return stats.sort_values(["total", "conexoes"], ascending=False).head(top_n)
+
+    def reachable(self, airport_id, hops=2):
+        """
+        Destinos alcançáveis a partir de um aeroporto em até `hops` voos.
+
+        A busca em largura expande a fronteira inteira de uma vez, fatiando o CSR com NumPy.
+
+        Args:
+            airport_id (int): Id do aeroporto de partida.
+            hops (int, optional): Número máximo de voos. Default é 2.
+
+        Returns:
+            pd.Series: Menor número de voos indexado pelo id do destino, sem o próprio aeroporto.
+        """
+        inicio = self.position(airport_id)
+        if inicio is None:
+            return pd.Series(dtype=np.int64, name="saltos")
+        saltos = np.full(self.size, -1, dtype=np.int64)
+        saltos[inicio] = 0
+        fronteira = np.array([inicio])
+        for salto in range(1, hops + 1):
+            starts, ends = self.indptr[fronteira], self.indptr[fronteira + 1]
+            lengths = ends - starts
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            fronteira = np.unique(self.indices[offsets])
+            fronteira = fronteira[saltos[fronteira] < 0]
+            if not len(fronteira):
+                break
+            saltos[fronteira] = salto
+        alcancados = saltos > 0
+        return pd.Series(saltos[alcancados], index=self.airports[alcancados], name="saltos")
+
+
+@versioned_memo(MEMO_SIZE, get_dataset_version)
+def route_network(filters=None):
+    """
+    Índice da rede de rotas para os filtros de período, montado a partir de resumo_rota.
+
+    A rede fica memorizada até que uma nova carga mude a versão dos dados, então hubs, graus
+    e alcance são calculados sobre arrays em memória, sem voltar ao banco.
+
+    Args:
+        filters (Filter | dict | list, optional): Filtros sobre ano, mes ou periodo. Default é None.
+
+    Returns:
+        RouteNetwork: Rede com os pesos de ROUTE_WEIGHTS.
+    """
+    rotas = get_aggregate("resumo_rota", ROUTE_WEIGHTS, filters or [],
+                          group_by="aeroporto_origem_id, aeroporto_destino_id")
+    rotas = rotas.dropna(subset=["aeroporto_origem_id", "aeroporto_destino_id"])
+    return RouteNetwork.from_edges(rotas["aeroporto_origem_id"], rotas["aeroporto_destino_id"],
+                                   {name: rotas[name] for name in ROUTE_WEIGHTS})
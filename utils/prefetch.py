@@ -0,0 +1,61 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+from utils.connection import POOL_SIZE
+
+# Uma thread por conexão de leitura do pool; mais que isso só esperaria na fila do pool.
+MAX_WORKERS = POOL_SIZE
+
+_executor = [None]
+_lock = threading.Lock()
+
+
+def get_executor():
+    with _lock:
+        if _executor[0] is None:
+            _executor[0] = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="anac-fetch")
+        return _executor[0]
+
+
+def submit(func, *args, **kwargs):
+    """
+    Agenda `func` no pool de leitura, compartilhado entre as sessões.
+
+    O contexto de quem agenda vai junto, então as queries entram no trace da página (ver
+    utils.profiling). A função não deve chamar `st.*`: só a thread do script desenha.
+
+    Returns:
+        concurrent.futures.Future: Resultado de `func`.
+    """
+    return get_executor().submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def render_concurrently(tasks):
+    """
+    Busca os dados de várias partes da página em paralelo e desenha cada uma assim que fica pronta.
+
+    Cada tarefa reserva seu lugar na página na ordem da lista, com um aviso de carregamento,
+    e é desenhada na ordem em que as consultas terminam. Uma falha aparece só no lugar da
+    tarefa que falhou.
+
+    Args:
+        tasks (list): Tuplas (container, fetch, render): `fetch` roda no pool sem argumentos
+            e `render` recebe o resultado dentro do container.
+    """
+    pendentes = {}
+    for container, fetch, render in tasks:
+        with container:
+            placeholder = st.empty()
+        placeholder.caption("⏳ Carregando...")
+        pendentes[submit(fetch)] = (placeholder, render)
+
+    for future in as_completed(pendentes):
+        placeholder, render = pendentes[future]
+        with placeholder.container():
+            try:
+                render(future.result())
+            except Exception as e:
+                st.exception(e)
@@ -0,0 +1,281 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from utils.indexes import explain_query_plan
+
+PROFILE_QUERIES = os.environ.get("ANAC_PROFILE", "") not in ("", "0")
+# Limite do log de queries lentas; desligado a menos que definido ou que o perfil esteja ligado.
+SLOW_QUERY_MS = float(os.environ.get("ANAC_SLOW_QUERY_MS") or (250 if PROFILE_QUERIES else "inf"))
+SLOW_QUERY_LOG = os.environ.get("ANAC_SLOW_QUERY_LOG", "")
+MAX_SLOW_QUERIES = 100
+
+# Arquivos cujos frames não contam como "quem chamou" a query.
+INTERNAL_FILES = ("database.py", "profiling.py", "cache.py")
+
+_trace = contextvars.ContextVar("anac_trace", default=None)
+_span = contextvars.ContextVar("anac_span", default=None)
+_slow = deque(maxlen=MAX_SLOW_QUERIES)
+_lock = threading.Lock()
+
+
+@dataclass
+class QueryRecord:
+    """Uma chamada de execute_query, com os tempos em segundos."""
+
+    sql: str
+    params: tuple
+    rows: int
+    fetch: float
+    frame: float
+    cached: bool
+    caller: str
+    span: str
+    start: float
+    thread: int
+    plan: list = None
+
+    @property
+    def total(self):
+        return self.fetch + self.frame
+
+
+@dataclass
+class Span:
+    """Execução de uma função de página marcada com `profiled`."""
+
+    name: str
+    parent: str
+    start: float
+    duration: float
+    thread: int
+
+
+@dataclass
+class Trace:
+    """Queries e funções de página de uma renderização."""
+
+    page: str
+    start: float = field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    queries: list = field(default_factory=list)
+    spans: list = field(default_factory=list)
+
+    def summary(self):
+        executadas = [q for q in self.queries if not q.cached]
+        return {
+            "page": self.page,
+            "duration": self.duration,
+            "queries": len(self.queries),
+            "cached": len(self.queries) - len(executadas),
+            "rows": sum(q.rows for q in executadas),
+            "fetch": sum(q.fetch for q in executadas),
+            "frame": sum(q.frame for q in executadas),
+        }
+
+    def by_caller(self):
+        """Soma os tempos por função chamadora, da mais cara para a mais barata."""
+        grupos = {}
+        for q in self.queries:
+            grupo = grupos.setdefault(q.caller, {"caller": q.caller, "queries": 0, "cached": 0, "rows": 0,
+                                                 "fetch_ms": 0.0, "frame_ms": 0.0})
+            grupo["queries"] += 1
+            grupo["cached"] += q.cached
+            grupo["rows"] += q.rows
+            grupo["fetch_ms"] += q.fetch * 1000
+            grupo["frame_ms"] += q.frame * 1000
+        return sorted(grupos.values(), key=lambda g: g["fetch_ms"] + g["frame_ms"], reverse=True)
+
+    def to_chrome(self):
+        """
+        Exporta o trace no formato Trace Event do Chrome, aberto por chrome://tracing e Perfetto.
+
+        Returns:
+            dict: Eventos de funções de página (`page`) e de queries (`sql`), em microssegundos.
+        """
+        def us(seconds):
+            return round(seconds * 1e6, 1)
+
+        eventos = [{"name": self.page, "cat": "render", "ph": "X", "ts": 0, "dur": us(self.duration),
+                    "pid": 1, "tid": 0}]
+        for s in self.spans:
+            eventos.append({"name": s.name, "cat": "page", "ph": "X", "ts": us(s.start - self.start),
+                            "dur": us(s.duration), "pid": 1, "tid": s.thread, "args": {"parent": s.parent}})
+        for q in self.queries:
+            eventos.append({
+                "name": " ".join(q.sql.split())[:80], "cat": "sql", "ph": "X", "ts": us(q.start - self.start),
+                "dur": us(q.total), "pid": 1, "tid": q.thread,
+                "args": {"sql": q.sql, "params": q.params, "rows": q.rows, "fetch_ms": q.fetch * 1000,
+                         "frame_ms": q.frame * 1000, "cached": q.cached, "caller": q.caller, "span": q.span,
+                         "plan": q.plan},
+            })
+        return {"traceEvents": eventos, "displayTimeUnit": "ms", "otherData": self.summary()}
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextlib.contextmanager
+def profile_page(page):
+    """
+    Agrupa as queries e funções de página executadas no bloco num único Trace.
+
+    Sem ANAC_PROFILE não cria nada e devolve None.
+    """
+    if not PROFILE_QUERIES:
+        yield None
+        return
+    trace = Trace(page)
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.start
+        _trace.reset(token)
+
+
+def profiled(func):
+    """Marca uma função de página para que apareça, com suas queries, no trace da renderização."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = _trace.get()
+        if trace is None:
+            return func(*args, **kwargs)
+        token = _span.set(func.__qualname__)
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _span.reset(token)
+            trace.spans.append(Span(func.__qualname__, _span.get(), inicio, time.perf_counter() - inicio,
+                                    threading.get_ident()))
+    return wrapper
+
+
+def find_caller():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename.endswith(INTERNAL_FILES):
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+def params_tuple(params):
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params or ())
+
+
+def record_query(conn, sql, params, rows, fetch, frame=0.0, cached=False):
+    """
+    Registra uma query no trace corrente e, se passar de SLOW_QUERY_MS, no log de queries lentas.
+
+    Queries lentas têm o EXPLAIN QUERY PLAN capturado na mesma conexão em que rodaram.
+
+    Args:
+        conn (sqlite3.Connection | None): Conexão da query; None para resultados vindos do cache.
+        sql (str): Comando executado.
+        params (tuple | dict | None): Parâmetros da query.
+        rows (int): Linhas devolvidas.
+        fetch (float): Segundos de execução e leitura do cursor.
+        frame (float, optional): Segundos de montagem do DataFrame. Default é 0.0.
+        cached (bool, optional): Se o resultado veio do cache. Default é False.
+    """
+    trace = _trace.get()
+    lenta = not cached and (fetch + frame) * 1000 >= SLOW_QUERY_MS
+    if trace is None and not lenta:
+        return
+    fim = time.perf_counter()
+    record = QueryRecord(sql, params_tuple(params), rows, fetch, frame, cached, find_caller(),
+                         _span.get() or "", fim - fetch - frame, threading.get_ident())
+    if lenta and conn is not None:
+        record.plan = explain_query_plan(conn, sql, params)
+        log_slow_query(record)
+    if trace is not None:
+        trace.queries.append(record)
+
+
+def log_slow_query(record):
+    linha = (f"Query lenta ({record.total * 1000:.0f} ms, {record.rows} linhas) em {record.caller}: "
+             f"{' '.join(record.sql.split())} {list(record.params)}")
+    print(linha)
+    for step in record.plan or []:
+        print(f"    {step}")
+    with _lock:
+        _slow.append(record)
+        if SLOW_QUERY_LOG:
+            with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"time": time.time(), "ms": record.total * 1000, "rows": record.rows,
+                                    "caller": record.caller, "sql": record.sql, "params": record.params,
+                                    "plan": record.plan}, default=str, ensure_ascii=False) + "\n")
+
+
+def slow_queries():
+    with _lock:
+        return list(_slow)
+
+
+def render_debug_panel(trace, cache=None, startup=None):
+    """
+    Mostra na barra lateral o resumo do trace da renderização, as queries lentas e o botão de exportação.
+
+    Args:
+        trace (Trace | None): Trace de `profile_page`; com None o painel não aparece.
+        cache (dict, optional): Contadores do cache de consultas (ver utils.database.cache_stats). Default é None.
+        startup (dict, optional): Tempos de `prepare_database` (ver utils.startup.startup_times). Default é None.
+    """
+    if trace is None:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    resumo = trace.summary()
+    with st.sidebar.expander("🐞 Perfil da página", expanded=False):
+        c1, c2 = st.columns(2)
+        c1.metric("Renderização", f"{resumo['duration'] * 1000:,.0f} ms")
+        c2.metric("Queries", f"{resumo['queries']} ({resumo['cached']} em cache)")
+        c1.metric("Leitura", f"{resumo['fetch'] * 1000:,.0f} ms")
+        c2.metric("DataFrames", f"{resumo['frame'] * 1000:,.0f} ms")
+
+        if startup is not None and startup["cold"] is not None:
+            st.caption("Preparação do banco")
+            c1, c2 = st.columns(2)
+            c1.metric("Primeira execução", f"{startup['cold'] * 1000:,.0f} ms")
+            quentes = startup["warm"]
+            c2.metric("Reexecuções (mediana)",
+                      f"{sorted(quentes)[len(quentes) // 2] * 1e6:,.0f} µs" if quentes else "-")
+
+        if cache is not None:
+            st.caption("Cache de consultas do processo")
+            c1, c2 = st.columns(2)
+            c1.metric("Acertos", f"{cache['hits']:,} ({cache['hit_rate']:.0%})")
+            c2.metric("Falhas", f"{cache['misses']:,}")
+            c1.metric("Entradas", f"{cache['entries']:,} ({cache['bytes'] / 2**20:,.1f} MB)")
+            c2.metric("Descartes", f"{cache['evictions'] + cache['expirations']:,}")
+
+        st.caption("Por função chamadora")
+        st.dataframe(pd.DataFrame(trace.by_caller()).round(1), hide_index=True, use_container_width=True)
+
+        if trace.spans:
+            st.caption("Funções de página")
+            spans = pd.DataFrame([{"função": s.name, "ms": round(s.duration * 1000, 1)} for s in trace.spans])
+            st.dataframe(spans.sort_values("ms", ascending=False), hide_index=True, use_container_width=True)
+
+        lentas = slow_queries()
+        if lentas:
+            st.caption(f"Queries lentas (≥ {SLOW_QUERY_MS:.0f} ms)")
+            for q in reversed(lentas[-10:]):
+                st.code(f"-- {q.total * 1000:.0f} ms, {q.caller}\n{' '.join(q.sql.split())}\n"
+                        + "\n".join(f"-- {step}" for step in q.plan or []), language="sql")
+
+        st.download_button("Exportar trace", json.dumps(trace.to_chrome(), default=str, ensure_ascii=False),
+                           file_name=f"trace_{trace.page}.json", mime="application/json")
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+TEXT = "text"
+INTEGER = "integer"
+FLOAT = "float"
+
+# Tipos lógicos das colunas de RelatorioVoosDetalhado. Texto vira `category`; inteiros
+# recebem a menor largura com sinal que comporta os valores carregados.
+FLIGHT_SCHEMA = {
+    "id": INTEGER,
+    "sigla_empresa": TEXT,
+    "nome_empresa": TEXT,
+    "nacionalidade_empresa": TEXT,
+    "ano": INTEGER,
+    "mes": INTEGER,
+    "periodo": INTEGER,
+    **{f"{campo}_aeroporto_{lado}": TEXT
+       for lado in ("origem", "destino")
+       for campo in ("sigla", "nome", "uf", "regiao", "pais", "continente")},
+    "natureza": TEXT,
+    "grupo_voo": TEXT,
+    **{coluna: INTEGER for coluna in (
+        "passageiros_pagos", "passageiros_gratis", "carga_paga_kg", "carga_gratis_kg", "correio_kg",
+        "ask", "rpk", "atk", "rtk", "combustivel_litros", "distancia_voada_km", "decolagens",
+        "carga_paga_km", "carga_gratis_km", "correio_km", "assentos", "payload", "bagagem_kg")},
+    # Declarada como INTEGER no banco, mas guarda horas fracionárias (ver prepare_chunk).
+    "horas_voadas": FLOAT,
+}
+
+SCHEMAS = {"RelatorioVoosDetalhado": FLIGHT_SCHEMA}
+
+# Só larguras com sinal: diferenças entre colunas (assentos - passageiros, por exemplo)
+# não podem dar a volta como dariam em inteiros sem sinal.
+INTEGER_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def integer_dtype(minimum, maximum):
+    """
+    Menor dtype inteiro com sinal que comporta o intervalo [minimum, maximum].
+
+    Args:
+        minimum (int): Menor valor da coluna.
+        maximum (int): Maior valor da coluna.
+
+    Returns:
+        numpy.dtype: int8, int16, int32 ou int64.
+    """
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def nullable(dtype):
+    return pd.api.types.pandas_dtype(dtype.name.capitalize())
+
+
+def compact_frame(df, schema=FLIGHT_SCHEMA):
+    """
+    Converte as colunas de um DataFrame para os tipos compactos do schema, validando os valores.
+
+    Inteiros sem nulos usam numpy (int8..int64); com nulos, o dtype anulável equivalente
+    (Int8..Int64). Colunas fora do schema não são alteradas.
+
+    Args:
+        df (pd.DataFrame): Dados a converter. É alterado no lugar.
+        schema (dict, optional): Coluna -> TEXT, INTEGER ou FLOAT. Default é FLIGHT_SCHEMA.
+
+    Returns:
+        pd.DataFrame: O próprio `df`, com os novos dtypes.
+
+    Raises:
+        ValueError: Se alguma coluna tiver valores incompatíveis com o tipo declarado.
+    """
+    invalidas = []
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if kind == TEXT:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype("category")
+            continue
+        numeric = pd.to_numeric(series, errors="coerce")
+        valores = numeric.dropna()
+        if len(valores) != series.notna().sum() or (kind == INTEGER and (valores % 1 != 0).any()):
+            invalidas.append(column)
+            continue
+        if kind == FLOAT:
+            df[column] = numeric.astype(np.float64)
+        elif valores.empty:
+            df[column] = numeric.astype(pd.Int64Dtype())
+        else:
+            dtype = integer_dtype(valores.min(), valores.max())
+            df[column] = numeric.astype(nullable(dtype) if len(valores) < len(numeric) else dtype)
+    if invalidas:
+        raise ValueError(f"Valores incompatíveis com o schema nas colunas: {', '.join(invalidas)}")
+    return df
+
+
+def apply_schema(df, table):
+    """Aplica `compact_frame` quando `table` tem schema declarado em SCHEMAS."""
+    schema = SCHEMAS.get(table)
+    return compact_frame(df, schema) if schema is not None else df
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.database import CSV_PATH, VOOS_COLUMNS
+
+# Colunas de medidas do CSV da ANAC, que recebem ruído; as demais são copiadas como estão.
+MEASURE_COLUMNS = VOOS_COLUMNS[VOOS_COLUMNS.index("PASSAGEIROS PAGOS"):]
+MAX_YEARS = 30
+NOISE = 0.2
+
+
+def jitter(values, rng, decimals=0):
+    """
+    Multiplica uma coluna de medidas por um fator aleatório em [1 - NOISE, 1 + NOISE].
+
+    Valores vazios continuam vazios e a vírgula decimal do CSV original é preservada.
+    """
+    numeric = pd.to_numeric(values.str.replace(",", "."), errors="coerce")
+    scaled = (numeric * rng.uniform(1 - NOISE, 1 + NOISE, len(numeric))).round(decimals)
+    text = scaled.astype(str).str.replace(".", ",") if decimals else scaled.astype("Int64").astype(str)
+    return text.where(numeric.notna(), values)
+
+
+def generate(output_dir, scale=10, seed=0, csv_path=CSV_PATH):
+    """
+    Gera CSVs sintéticos no formato da ANAC, com `scale` vezes as linhas do CSV de base.
+
+    Os dados são espalhados por até MAX_YEARS anos anteriores ao último ano da base, um
+    arquivo por ano, para que os períodos não se sobreponham na carga. Cada ano sorteia
+    linhas da base com reposição e aplica ruído às medidas, mantendo empresas, aeroportos
+    e rotas reais.
+
+    Args:
+        output_dir (str): Diretório onde os arquivos serão gravados.
+        scale (int, optional): Multiplicador do número de linhas da base. Default é 10.
+        seed (int, optional): Semente do gerador aleatório. Default é 0.
+        csv_path (str, optional): CSV de base. Default é CSV_PATH.
+
+    Returns:
+        list: Caminhos dos arquivos gerados, do ano mais antigo ao mais recente.
+    """
+    base = pd.read_csv(csv_path, encoding="latin-1", delimiter=";", dtype=str, keep_default_na=False)
+    rng = np.random.default_rng(seed)
+    anos = max(1, min(scale, MAX_YEARS))
+    linhas = int(round(len(base) * scale / anos))
+    ultimo = int(base["ANO"].astype(int).max())
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for k in reversed(range(anos)):
+        ano = base.iloc[rng.integers(0, len(base), linhas)].reset_index(drop=True)
+        ano["ANO"] = str(ultimo - k)
+        for column in MEASURE_COLUMNS:
+            ano[column] = jitter(ano[column], rng, decimals=3 if column == "HORAS VOADAS" else 0)
+        path = os.path.join(output_dir, f"anac_{ultimo - k}.csv")
+        ano.to_csv(path, sep=";", index=False, encoding="latin-1")
+        paths.append(path)
+    return paths
@@ -1,7 +1,12 @@
+import pandas as pd
 import streamlit as st
 from unidecode import unidecode
-from utils.database import format_filters, get_all
+from utils.database import get_columns, get_count, get_page
+from utils.facets import get_facets
+from utils.filters import from_dict
+from utils.profiling import profiled
 
+@profiled
 def render_tables():
     filters = sidebar_filters()
 
@@ -11,28 +16,72 @@ def render_tables():
 
     voos_filter = []
     if filters["aero"]:
-        origem_ft = format_filters(filters["aero"], suffix="_aeroporto_origem")
-        destino_ft = format_filters(filters["aero"], suffix="_aeroporto_destino")
-        voos_filter.append(f"({origem_ft} OR {destino_ft})")
+        origem_ft = from_dict(filters["aero"], suffix="_aeroporto_origem")
+        destino_ft = from_dict(filters["aero"], suffix="_aeroporto_destino")
+        voos_filter.append(origem_ft | destino_ft)
 
     if filters["emp"]:
-        voos_filter.append(format_filters(filters["emp"], suffix="_empresa"))
+        voos_filter.append(from_dict(filters["emp"], suffix="_empresa"))
 
     if filters['voos']:
-        voos_filter.append(format_filters(filters["voos"]))
+        voos_filter.append(from_dict(filters["voos"]))
             
     print_table("RelatorioVoosDetalhado", voos_filter, "Voos")
 
 
+PAGE_SIZES = [25, 50, 100, 500]
+
+@profiled
 def print_table(table, filters, name=""):
     if not name:
         name = table.capitalize()
     st.header(f"Tabela {name}")
-    df = get_all(table, filters=filters)
-    st.dataframe(df, use_container_width=True, hide_index=True)
-    st.subheader(f"Registros de {name} Encontrados : "+str(len(df)))
+    prefix = f"tabela_{clean_name(name)}"
+
+    c1, c2, c3 = st.columns([2, 1, 1])
+    order_by = c1.selectbox("Ordenar por", get_columns(table), key=f"{prefix}_ordem")
+    descending = c2.toggle("Decrescente", key=f"{prefix}_decrescente")
+    page_size = c3.selectbox("Registros por página", PAGE_SIZES, index=1, key=f"{prefix}_tamanho")
+
+    state = st.session_state.setdefault(prefix, {})
+    signature = (repr(filters), order_by, descending, page_size)
+    if state.get("signature") != signature:
+        state.update(signature=signature, cursors=[None], next=None)
+
+    df = get_page(table, filters, order_by, descending, state["cursors"][-1], page_size + 1)
+    state["next"] = page_cursor(df.iloc[page_size - 1], order_by) if len(df) > page_size else None
+    st.dataframe(df.head(page_size), use_container_width=True, hide_index=True)
+
+    total = get_count(table, filters)
+    pages = max(1, -(-total // page_size))
+    c4, c5, c6 = st.columns([1, 2, 1])
+    c4.button("⬅️ Anterior", key=f"{prefix}_anterior", on_click=previous_page, args=(prefix,),
+              disabled=len(state["cursors"]) == 1)
+    c5.caption(f"Página {len(state['cursors'])} de {pages}")
+    c6.button("Próxima ➡️", key=f"{prefix}_proxima", on_click=next_page, args=(prefix,),
+              disabled=state["next"] is None)
+
+    st.subheader(f"Registros de {name} Encontrados : "+str(total))
     st.divider()
 
+def page_cursor(row, order_by):
+    value = row[order_by]
+    if pd.isna(value):
+        value = None
+    elif hasattr(value, "item"):
+        value = value.item()
+    return value, int(row["id"])
+
+def next_page(prefix):
+    state = st.session_state[prefix]
+    if state["next"] is not None:
+        state["cursors"].append(state["next"])
+
+def previous_page(prefix):
+    state = st.session_state[prefix]
+    if len(state["cursors"]) > 1:
+        state["cursors"].pop()
+
 
 def sidebar_filters():
     with st.sidebar:
@@ -58,7 +107,7 @@ def sidebar_filters():
     return filtros
 
 def filter_container(name, labels, table):
-    df = get_all(table)
+    options = get_facets()["values"][table]
     filters = {}
     prefix = clean_name(name)
     with st.expander(name):
@@ -70,19 +119,18 @@ def filter_container(name, labels, table):
 
             for l in labels:
                 low_name = clean_name(l)
-                tmp_ft = selectbox(l, df, prefix)
+                tmp_ft = selectbox(l, options, prefix)
                 if tmp_ft:
                     filters[low_name] = tmp_ft
     return filters
 
 
-def selectbox(label, df, key_prefix, column=''):
+def selectbox(label, options, key_prefix, column=''):
     key = clean_name(label)
     if not column:
         column = key
     key = f"{key_prefix}_{key}"
-    options = df[column].dropna().sort_values().unique()
-    return st.selectbox(label, options, key=key, index=None)
+    return st.selectbox(label, options[column], key=key, index=None)
 
 def clean_name(name):
     name = unidecode(name.lower())
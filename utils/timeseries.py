@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from utils.database import SERIES_METRICS, get_all
+
+
+def min_max(frame):
+    """
+    Normaliza cada coluna para [0, 1] com operações vetorizadas do NumPy.
+
+    Colunas constantes viram 0 e valores ausentes continuam ausentes.
+
+    Args:
+        frame (pd.DataFrame): Valores numéricos, uma série por coluna.
+
+    Returns:
+        pd.DataFrame: Valores normalizados, com o mesmo índice e colunas.
+    """
+    valores = frame.to_numpy(dtype=float)
+    if valores.size == 0:
+        return frame.astype(float)
+    presentes = ~np.isnan(valores)
+    minimo = np.min(valores, axis=0, where=presentes, initial=np.inf)
+    maximo = np.max(valores, axis=0, where=presentes, initial=-np.inf)
+    amplitude = maximo - minimo
+    amplitude[~(amplitude > 0)] = 1.0
+    return pd.DataFrame((valores - minimo) / amplitude, index=frame.index, columns=frame.columns)
+
+
+def monthly_series(filters=[], metrics=None):
+    """
+    Lê a série mensal mantida pela carga (ver refresh_series em utils.database).
+
+    As variações são as de cada mês contra o mês anterior presente na série, inclusive para o
+    primeiro mês de um intervalo filtrado.
+
+    Args:
+        filters (Filter | dict | list, optional): Filtros sobre ano, mes ou periodo. Default é [].
+        metrics (list, optional): Métricas de SERIES_METRICS. Default é None (todas).
+
+    Returns:
+        tuple: (valores, variações) em DataFrames indexados por periodo, uma coluna por métrica.
+            As variações são frações (0.1 é 10%) e ficam ausentes quando não há mês anterior
+            ou ele vale zero.
+    """
+    metrics = list(metrics or SERIES_METRICS)
+    serie = get_all("serie_mensal", ["periodo", *metrics, *(f"variacao_{metric}" for metric in metrics)], filters)
+    serie = serie.sort_values("periodo").set_index("periodo")
+    variacoes = serie[[f"variacao_{metric}" for metric in metrics]].astype(float)
+    variacoes.columns = metrics
+    return serie[metrics].astype(float), variacoes